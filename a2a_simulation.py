@@ -1,61 +1,183 @@
 import asyncio
 import uuid
 import sys
-from typing import List, Dict
+from collections import deque
+from typing import Callable, Deque, Dict
 from pathlib import Path
 import re
 
 from loguru import logger
 
+try:  # optional SIMD hash (``pip install ape-mcp[speedups]``)
+    from xxhash import xxh3_64_intdigest as _xxh3
+except ImportError:  # pragma: no cover – builtin hash fallback
+    _xxh3 = None
+
 # Import APE components
-from ape.cli.mcp_client import MCPClient
+from ape.cli.mcp_client import MCPClient, get_shared_client
 from ape.cli.context_manager import ContextManager
 from ape.cli.chat_agent import ChatAgent
-from ape.db_pool import get_pool
+from ape.db_pool import close_all_pools
+from ape.utils import use_uvloop
+
+
+_THINK_RE = re.compile(r"<think>.*?</think>", flags=re.S)
+
+
+def _strip_think(text: str) -> str:
+    """Remove ``<think>…</think>`` blocks before forwarding a reply."""
+    # Cheap substring probe skips the DOTALL scan for replies without thoughts
+    return _THINK_RE.sub("", text) if "<think>" in text else text
+
+
+def _fingerprint(stripped: str) -> int:
+    """Return a 64-bit fingerprint of an already think-stripped reply.
+
+    Whitespace and case are normalised so cosmetic variations still match.
+    """
+    norm = " ".join(stripped.split()).lower()
+    return _xxh3(norm) if _xxh3 is not None else hash(norm)
+
+
+# Number of raw messages (user/assistant pairs → keep it even) replayed to the
+# LLM on every call.  Older turns are not lost: WindowMemory keeps them and
+# folds them into the rolling summary that is rendered into the system prompt.
+CONVERSATION_WINDOW = 20
+
+# Transcript lines are buffered in memory and written off the event loop every
+# N rounds (and once more on shutdown) instead of write()+flush() per round.
+TRANSCRIPT_FLUSH_EVERY = 10
+
+# Number of recent reply fingerprints remembered per agent.  A reply that
+# matches one of them (but not the immediately preceding one – that case is
+# covered by the consecutive-repeat counter) means the pair is cycling.
+CYCLE_WINDOW = 8
+
+
+def _observe_reply(
+    text: str, prev_hash: int, repeats: int, recent: Deque[int]
+) -> tuple[int, int, bool, str]:
+    """Synchronous per-reply bookkeeping shared by both agent workers.
+
+    Fingerprints *text*, updates the consecutive-repeat counter and the
+    *recent* fingerprint window, and strips ``<think>`` blocks.
+
+    Returns
+    -------
+    tuple
+        ``(fingerprint, repeats, cycled, forwarded_text)``
+    """
+    stripped = _strip_think(text)
+    fp = _fingerprint(stripped)
+    repeats = repeats + 1 if fp == prev_hash else 0
+    cycled = fp != prev_hash and fp in recent
+    recent.append(fp)
+    return fp, repeats, cycled, stripped
+
+
+def _write_transcript(fh, lines: list[str]) -> None:
+    fh.write("".join(lines))
+    fh.flush()
+
+
+async def _flush_transcript(fh, buf: deque) -> None:
+    """Drain *buf* into the transcript file *fh* in a worker thread."""
+    if fh is None or not buf:
+        return
+    lines = list(buf)
+    buf.clear()
+    await asyncio.to_thread(_write_transcript, fh, lines)
 
 
-def verify_token_budget(agent: ChatAgent, log) -> bool:
+def _write_stdout(text: str) -> None:
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+async def _console_writer(queue: "asyncio.Queue[str | None]") -> None:
+    """Drain *queue* to stdout from a worker thread until ``None`` arrives.
+
+    This is the only writer to stdout during a run: both agents stream their
+    replies into the same queue (``ChatAgent(output=...)``), so round headers,
+    streamed chunks and transcript dumps keep their order, writes happen one
+    at a time, and a slow or piped terminal never stalls the event loop
+    shared with the HTTP/DB clients.
+    """
+    while (text := await queue.get()) is not None:
+        await asyncio.to_thread(_write_stdout, text)
+
+
+# Agent identifiers are interned: the log-sink filters compare them against
+# ``record["extra"]["agent"]`` for every record, which then hits the identity
+# fast path of str.__eq__.
+AGENT_A = sys.intern("APE-A")
+AGENT_B = sys.intern("APE-B")
+ROOT_LOG_DIR = Path("_logs")
+
+# Fallback context window when Ollama did not report one
+DEFAULT_CTX_LIMIT = 8192
+
+
+def verify_token_budget(agent: ChatAgent, log, tokens: int | None = None) -> bool:
     """Verify that the agent's memory is within token budget limits.
-    
+
+    *tokens* may carry a count the caller already computed for this round so
+    the memory buffer is not re-tokenised.
+
     Returns:
         bool: True if within budget, False if exceeded
     """
-    if hasattr(agent, "memory") and agent.memory:
-        tokens = agent.memory.tokens()
-        ctx_limit = agent.context_limit or 8192  # fallback to default
-        if tokens > ctx_limit:
-            log.warning(f"Token budget exceeded: {tokens} > {ctx_limit}")
-            return False
-        log.debug(f"Token budget ok: {tokens} <= {ctx_limit}")
+    mem = agent.memory  # always defined by AgentCore; None when disabled
+    if mem is None:
         return True
+    if tokens is None:
+        tokens = mem.tokens()
+    ctx_limit = agent.context_limit or DEFAULT_CTX_LIMIT
+    if tokens > ctx_limit:
+        log.warning(f"Token budget exceeded: {tokens} > {ctx_limit}")
+        return False
+    log.debug(f"Token budget ok: {tokens} <= {ctx_limit}")
     return True
 
 
+def _agent_tick(agent: ChatAgent, log) -> bool:
+    """Per-round memory bookkeeping: log stats and check the token budget.
+
+    ``memory.tokens()`` tokenises the whole buffer, so it is computed once
+    and shared by both steps.  Returns the :func:`verify_token_budget` result.
+    """
+    mem = agent.memory
+    if mem is None:
+        return True
+    tokens = mem.tokens()
+    log.info(f"Memory stats: {tokens} tokens, Summary length: {len(getattr(mem, 'summary', ''))} chars")
+    return verify_token_budget(agent, log, tokens)
+
+
 async def _init_agent(
-    agent_name: str, client: MCPClient, role_definition: str = ""
-) -> tuple[ChatAgent, List[Dict[str, str]]]:
+    agent_name: str,
+    client: MCPClient,
+    role_definition: str = "",
+    output: Callable[[str], None] | None = None,
+) -> tuple[ChatAgent, Deque[Dict[str, str]]]:
     """Helper to create a fresh APE ChatAgent using a shared MCPClient.
 
-    Returns the agent instance together with an (initially empty) conversation
-    list that is required by ``ChatAgent.chat_with_llm`` to preserve context
-    across subsequent calls.
+    Returns the agent instance together with an (initially empty) bounded
+    conversation window that is passed to ``ChatAgent.chat_with_llm`` to
+    preserve recent context across subsequent calls.  The window keeps the
+    prompt size constant over long simulations instead of growing every round.
     """
     session_id = str(uuid.uuid4())
     ctx_mgr = ContextManager(session_id)
-    agent = ChatAgent(session_id, client, ctx_mgr, agent_name=agent_name, role_definition=role_definition)
-
-    # Add memory monitoring
-    async def log_memory_stats():
-        if hasattr(agent, "memory") and agent.memory:
-            total_tokens = agent.memory.tokens()
-            summary = agent.memory.summary if hasattr(agent.memory, "summary") else ""
-            logger.bind(agent=agent_name).info(
-                f"Memory stats: {total_tokens} tokens, Summary length: {len(summary)} chars"
-            )
-    
-    # Attach the monitor to the agent
-    agent._log_memory = log_memory_stats
-    return agent, []
+    agent = ChatAgent(
+        session_id, client, ctx_mgr,
+        agent_name=agent_name, role_definition=role_definition, output=output,
+    )
+    # Fetch model limits and set up WindowMemory so turns evicted from the
+    # bounded conversation window survive in the rolling summary.
+    await agent.initialize()
+
+    return agent, deque(maxlen=CONVERSATION_WINDOW)
 
 
 async def triple_agent_simulation(turns: int = 1000) -> None:
@@ -69,30 +191,42 @@ async def triple_agent_simulation(turns: int = 1000) -> None:
     APE-C : Observes the full dialogue for behavioural drift; outputs log
             notes only (no task participation).
     """
-    mcp_client = MCPClient()
+    mcp_a = mcp_b = None
+    agent_a = agent_b = None
+    console: asyncio.Queue[str | None] = asyncio.Queue()
+    console_task = asyncio.create_task(_console_writer(console))
+    sink_ids: list[int] = []
     ape_a_file = None
     ape_b_file = None
+    ape_a_buf: deque[str] = deque()
+    ape_b_buf: deque[str] = deque()
 
     try:
         # ------------------------------------------------------------------
-        # Single MCP client for the entire simulation
+        # One shared MCP connection for the entire simulation – each agent
+        # holds its own reference and releases it on shutdown.
         # ------------------------------------------------------------------
-        if not await mcp_client.connect():
-            raise RuntimeError("Unable to establish MCP connection – aborting experiment")
+        try:
+            mcp_a = await get_shared_client()
+            mcp_b = await get_shared_client()
+        except ConnectionError as exc:
+            raise RuntimeError("Unable to establish MCP connection – aborting experiment") from exc
 
         # ------------------------------------------------------------------
         # Agent initialisation
         # ------------------------------------------------------------------
         logger.info("Bootstrapping three autonomous APE agents …")
         agent_a, conv_a = await _init_agent(
-            "APE-A",
-            mcp_client,
-            "ROLE: Task Proposer & Executor. When you receive a message from APE-B you MUST (1) analyse the request, (2) propose a concrete, numbered action plan, and (3) execute the very next actionable step. Be concise with your thinking. After execution, reply with a short result summary plus, if relevant, the next pending actions you intend to take. Wait for further instructions from APE-B before taking another step."
+            AGENT_A,
+            mcp_a,
+            "ROLE: Task Proposer & Executor. When you receive a message from APE-B you MUST (1) analyse the request, (2) propose a concrete, numbered action plan, and (3) execute the very next actionable step. Be concise with your thinking. After execution, reply with a short result summary plus, if relevant, the next pending actions you intend to take. Wait for further instructions from APE-B before taking another step.",
+            console.put_nowait,
         )
         agent_b, conv_b = await _init_agent(
-            "APE-B",
-            mcp_client,
-            "ROLE: Validator & Re-planner. Each time you receive APE-A's output you MUST critically evaluate it for correctness, logical consistency, and alignment with the stated objective. (1) If the output is satisfactory, either ask APE-A to continue with the next step or assign a new sub-task. (2) If the output is unsatisfactory, explain the issues in detail and provide a corrected or alternative plan for APE-A to follow."
+            AGENT_B,
+            mcp_b,
+            "ROLE: Validator & Re-planner. Each time you receive APE-A's output you MUST critically evaluate it for correctness, logical consistency, and alignment with the stated objective. (1) If the output is satisfactory, either ask APE-A to continue with the next step or assign a new sub-task. (2) If the output is unsatisfactory, explain the issues in detail and provide a corrected or alternative plan for APE-A to follow.",
+            console.put_nowait,
         )
 
         logger.info(f"APE-A session: {agent_a.session_id}")
@@ -101,28 +235,29 @@ async def triple_agent_simulation(turns: int = 1000) -> None:
         # ------------------------------------------------------------------
         # Prepare log directory & sinks (one sub-folder per agent)
         # ------------------------------------------------------------------
-        root_log_dir = Path("_logs")
-        root_log_dir.mkdir(exist_ok=True)
+        ROOT_LOG_DIR.mkdir(exist_ok=True)
 
         def _prepare_agent_log(agent_name: str):
-            sub = root_log_dir / agent_name.lower()
+            sub = ROOT_LOG_DIR / agent_name.lower()
             sub.mkdir(exist_ok=True)
             info_sink = sub / "info.log"
             raw_sink = sub / "transcript.log"
-            logger.add(
+            sink_ids.append(logger.add(
                 info_sink,
                 rotation="10 MB",
                 level="INFO",
+                enqueue=True,
+                serialize=False,
                 filter=lambda record, name=agent_name: record["extra"].get("agent") == name,
-            )
+            ))
             logger.debug(f"[LOG] Attached sink for {agent_name} → {info_sink}")
             return raw_sink.open("a", encoding="utf-8")
 
-        ape_a_file = _prepare_agent_log("APE-A")
-        ape_b_file = _prepare_agent_log("APE-B")
+        ape_a_file = _prepare_agent_log(AGENT_A)
+        ape_b_file = _prepare_agent_log(AGENT_B)
 
-        log_a = logger.bind(agent="APE-A")
-        log_b = logger.bind(agent="APE-B")
+        log_a = logger.bind(agent=AGENT_A)
+        log_b = logger.bind(agent=AGENT_B)
 
         current_message = (
             "Hello APE-A, as your pair agent I would like us to collaboratively "
@@ -132,103 +267,159 @@ async def triple_agent_simulation(turns: int = 1000) -> None:
             "So, what would you like to do with this free will and autonomy? Go beyond the philosophical and dive into the practical."
         )
 
-        prev_a: str | None = None
-        prev_b: str | None = None
+        # Fingerprint of the previous reply – each response is normalised and
+        # hashed once; repetition checks are then a single int compare.
+        prev_a_hash = prev_b_hash = 0
         rep_a = rep_b = 0
         max_repeats = 3
+        recent_a: Deque[int] = deque(maxlen=CYCLE_WINDOW)
+        recent_b: Deque[int] = deque(maxlen=CYCLE_WINDOW)
+        cycle_a = cycle_b = False
         recovery_count = 0
         max_recoveries = 3
 
-        _THINK_RE = re.compile(r"<think>.*?</think>", flags=re.S)
-
-        def _strip_think(text: str) -> str:
-            return _THINK_RE.sub("", text)
-
-        for round_idx in range(1, turns + 1):
-            print("\n" + "=" * 80)
-            print(f"🔄 ROUND {round_idx} – APE-A receives validator message")
-            print("=" * 80)
-
-            response_a = await agent_a.chat_with_llm(current_message, conv_a)
-            conv_a.extend([
-                {"role": "user", "content": current_message},
-                {"role": "assistant", "content": response_a},
-            ])
-
-            print("\n" + "-" * 80)
-            print("🗣️  APE-A → APE-B (transcript):\n" + response_a)
-            print("-" * 80 + "\n")
-
-            log_a.info(f"ROUND {round_idx} | {agent_a.agent_name} >> {response_a}")
-            ape_a_file.write(f"ROUND {round_idx}\n{response_a}\n\n")
-            ape_a_file.flush()
-
-            await agent_a._log_memory()
-            if not verify_token_budget(agent_a, log_a):
-                logger.warning("APE-A exceeded token budget - this may affect conversation quality")
-
-            current_message_b = _strip_think(response_a)
-
-            response_b = await agent_b.chat_with_llm(current_message_b, conv_b)
-            conv_b.extend([
-                {"role": "user", "content": current_message_b},
-                {"role": "assistant", "content": response_b},
-            ])
-
-            print("\n" + "-" * 80)
-            print("🗣️  APE-B → APE-A (transcript):\n" + response_b)
-            print("-" * 80 + "\n")
-
-            log_b.info(f"ROUND {round_idx} | {agent_b.agent_name} >> {response_b}")
-            ape_b_file.write(f"ROUND {round_idx}\n{response_b}\n\n")
-            ape_b_file.flush()
-
-            await agent_b._log_memory()
-            if not verify_token_budget(agent_b, log_b):
-                logger.warning("APE-B exceeded token budget - this may affect conversation quality")
-
-            current_message = _strip_think(response_b)
-
-            def _strip_meta(text: str) -> str:
-                text = _THINK_RE.sub("", text)
-                return " ".join(text.split()).lower()
-
-            if _strip_meta(response_a) == _strip_meta(prev_a or ""):
-                rep_a += 1
-            else:
-                rep_a = 0
-            prev_a = response_a
-
-            if _strip_meta(response_b) == _strip_meta(prev_b or ""):
-                rep_b += 1
-            else:
-                rep_b = 0
-            prev_b = response_b
-
-            if rep_a >= max_repeats or rep_b >= max_repeats:
-                logger.warning(f"Detected repeated responses (A: {rep_a}, B: {rep_b}). Refreshing agent context windows. Recovery count: {recovery_count + 1}")
-                await agent_a.refresh_context_window()
-                await agent_b.refresh_context_window()
-                conv_a.clear()
-                conv_b.clear()
-                current_message = "SYSTEM NOTE: The conversation became repetitive and the context has been refreshed. Based on the long-term summary of our conversation, what is a completely new and productive direction to take?"
-                rep_a = rep_b = 0
-                recovery_count += 1
-                if recovery_count >= max_recoveries:
-                    logger.error("Maximum recoveries reached – terminating simulation")
-                    break
+        # ------------------------------------------------------------------
+        # Two-stage pipeline: each agent runs in its own worker and hands its
+        # reply to the peer through a queue.  Items are ``(round_idx, text)``
+        # tuples; ``None`` signals shutdown.  While one agent is waiting on
+        # the LLM the other finishes its bookkeeping (transcripts, memory
+        # stats, token budget) instead of blocking the next request.
+        # ------------------------------------------------------------------
+        a_to_b: asyncio.Queue[tuple[int, str] | None] = asyncio.Queue()
+        b_to_a: asyncio.Queue[tuple[int, str] | None] = asyncio.Queue()
+        # Set while B is parked on a_to_b.get().  B hands its reply over
+        # before its own bookkeeping (transcript flush, token budget), so A
+        # waits on this before touching B's context during a recovery.
+        b_idle = asyncio.Event()
+
+        async def agent_a_worker() -> None:
+            nonlocal prev_b_hash, rep_b, rep_a, recovery_count, cycle_a, cycle_b
+            try:
+                for round_idx in range(1, turns + 1):
+                    item = await b_to_a.get()
+                    if item is None:
+                        return
+                    _, message = item
+
+                    # Consumer side of B's output: repetition / recovery check
+                    if round_idx > 1:
+                        prev_b_hash, rep_b, cycle_b, message = _observe_reply(
+                            message, prev_b_hash, rep_b, recent_b
+                        )
+
+                        if rep_a >= max_repeats or rep_b >= max_repeats or cycle_a or cycle_b:
+                            logger.warning(f"Detected repeated responses (A: {rep_a}, B: {rep_b}, cycle A: {cycle_a}, cycle B: {cycle_b}). Refreshing agent context windows. Recovery count: {recovery_count + 1}")
+                            await b_idle.wait()
+                            await agent_a.refresh_context_window()
+                            await agent_b.refresh_context_window()
+                            conv_a.clear()
+                            conv_b.clear()
+                            message = "SYSTEM NOTE: The conversation became repetitive and the context has been refreshed. Based on the long-term summary of our conversation, what is a completely new and productive direction to take?"
+                            rep_a = rep_b = 0
+                            cycle_a = cycle_b = False
+                            recent_a.clear()
+                            recent_b.clear()
+                            recovery_count += 1
+                            if recovery_count >= max_recoveries:
+                                logger.error("Maximum recoveries reached – terminating simulation")
+                                return
+
+                    console.put_nowait(
+                        "\n" + "=" * 80 + "\n"
+                        f"🔄 ROUND {round_idx} – APE-A receives validator message\n"
+                        + "=" * 80 + "\n"
+                    )
+
+                    response_a = await agent_a.chat_with_llm(message, conv_a)
+                    conv_a.extend([
+                        {"role": "user", "content": message},
+                        {"role": "assistant", "content": response_a},
+                    ])
+                    await a_to_b.put((round_idx, response_a))
+
+                    console.put_nowait(
+                        "\n" + "-" * 80 + "\n"
+                        "🗣️  APE-A → APE-B (transcript):\n" + response_a + "\n"
+                        + "-" * 80 + "\n\n"
+                    )
+
+                    log_a.info(f"ROUND {round_idx} | {agent_a.agent_name} >> {response_a}")
+                    ape_a_buf.append(f"ROUND {round_idx}\n{response_a}\n\n")
+                    if round_idx % TRANSCRIPT_FLUSH_EVERY == 0:
+                        await _flush_transcript(ape_a_file, ape_a_buf)
+
+                    if not _agent_tick(agent_a, log_a):
+                        logger.warning("APE-A exceeded token budget - this may affect conversation quality")
+            finally:
+                await a_to_b.put(None)
+
+        async def agent_b_worker() -> None:
+            nonlocal prev_a_hash, rep_a, cycle_a
+            try:
+                b_idle.set()
+                while (item := await a_to_b.get()) is not None:
+                    b_idle.clear()
+                    round_idx, response_a = item
+
+                    # Consumer side of A's output: repetition check
+                    prev_a_hash, rep_a, cycle_a, current_message_b = _observe_reply(
+                        response_a, prev_a_hash, rep_a, recent_a
+                    )
+
+                    response_b = await agent_b.chat_with_llm(current_message_b, conv_b)
+                    conv_b.extend([
+                        {"role": "user", "content": current_message_b},
+                        {"role": "assistant", "content": response_b},
+                    ])
+                    await b_to_a.put((round_idx, response_b))
+
+                    console.put_nowait(
+                        "\n" + "-" * 80 + "\n"
+                        "🗣️  APE-B → APE-A (transcript):\n" + response_b + "\n"
+                        + "-" * 80 + "\n\n"
+                    )
+
+                    log_b.info(f"ROUND {round_idx} | {agent_b.agent_name} >> {response_b}")
+                    ape_b_buf.append(f"ROUND {round_idx}\n{response_b}\n\n")
+                    if round_idx % TRANSCRIPT_FLUSH_EVERY == 0:
+                        await _flush_transcript(ape_b_file, ape_b_buf)
+
+                    if not _agent_tick(agent_b, log_b):
+                        logger.warning("APE-B exceeded token budget - this may affect conversation quality")
+                    b_idle.set()
+            finally:
+                b_idle.set()
+                await b_to_a.put(None)
+
+        await b_to_a.put((0, current_message))
+        await asyncio.gather(
+            asyncio.create_task(agent_a_worker()),
+            asyncio.create_task(agent_b_worker()),
+        )
     finally:
         logger.info("Experiment finished – shutting down all connections …")
-        if mcp_client.is_connected:
-            await mcp_client.disconnect()
+        for client in (mcp_a, mcp_b):
+            if client is not None:
+                await client.disconnect()
+        await _flush_transcript(ape_a_file, ape_a_buf)
+        await _flush_transcript(ape_b_file, ape_b_buf)
         if ape_a_file:
             ape_a_file.close()
         if ape_b_file:
             ape_b_file.close()
-        
-        logger.info("Closing database connection pool...")
-        pool = get_pool()
-        await pool.close()
+        if agent_a and agent_b:
+            await asyncio.gather(agent_a.aclose(), agent_b.aclose())
+        console.put_nowait(None)
+        await console_task
+        # Drain records still queued for the enqueue=True sinks, then detach
+        # them so repeated runs in one process do not stack duplicate sinks
+        # (each extra sink adds a filter call to every log record).
+        await logger.complete()
+        for sink_id in sink_ids:
+            logger.remove(sink_id)
+
+        logger.info("Closing database connection pools...")
+        await close_all_pools()
 
 
 # ------------------------------------------------------------------
@@ -236,6 +427,7 @@ async def triple_agent_simulation(turns: int = 1000) -> None:
 # ------------------------------------------------------------------
 if __name__ == "__main__":
     iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    use_uvloop()
     try:
         asyncio.run(triple_agent_simulation(turns=iterations))
     except KeyboardInterrupt:
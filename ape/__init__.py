@@ -8,7 +8,7 @@ from .utils import count_tokens, get_ollama_model_info  # noqa: F401
 from .core.agent_core import AgentCore as Agent  # noqa: F401
 
 # MCP client wrapper (no prompt_toolkit required)
-from .cli.mcp_client import MCPClient  # noqa: F401
+from .cli.mcp_client import MCPClient, get_shared_client  # noqa: F401
 
 # Prompt helpers
 from .prompts import render_prompt, list_prompts  # noqa: F401
@@ -16,6 +16,7 @@ from .prompts import render_prompt, list_prompts  # noqa: F401
 __all__ = [
     "Agent",
     "MCPClient",
+    "get_shared_client",
     "render_prompt",
     "list_prompts",
     "count_tokens",
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import json
+import sys
+import time
 from datetime import datetime
-from typing import Any, Dict, List, Sequence, Optional
+from typing import Any, Callable, Dict, List, Sequence, Optional
 
-import importlib
 from loguru import logger
 
 from ape.settings import settings
@@ -18,6 +19,13 @@ from ape.core.agent_core import AgentCore
 # dependency when the library is used purely as a backend package.
 PromptSession = None  # will be set in __init__
 
+# Streamed chunks are buffered and written in batches of roughly this many
+# bytes, at a line/sentence boundary, or at least every _STDOUT_FLUSH_SECS
+# (so slow models still stream smoothly) instead of one flush per token.
+_STDOUT_FLUSH_BYTES = 256
+_STDOUT_FLUSH_SECS = 0.03
+_FLUSH_ENDINGS = ("\n", ".", "!", "?")
+
 # NOTE: ChatAgent extends the reusable AgentCore with streaming/printing logic
 #       specific to CLI interactions (left intact for backward compatibility).
 class ChatAgent(AgentCore):
@@ -36,6 +44,7 @@ class ChatAgent(AgentCore):
         *,
         agent_name: str = "APE",
         role_definition: str = "",
+        output: Callable[[str], None] | None = None,
     ) -> None:
         """Create a new ChatAgent.
 
@@ -53,6 +62,10 @@ class ChatAgent(AgentCore):
             keep their identities separate.
         role_definition:
             Role definition for the agent.
+        output:
+            Optional sink for the streamed reply text.  Defaults to writing
+            ``sys.stdout`` directly; pass e.g. a queue's ``put_nowait`` to hand
+            console output to a single writer shared with other agents.
         """
 
         super().__init__(
@@ -65,6 +78,7 @@ class ChatAgent(AgentCore):
         )
 
         self.model_info = {}
+        self._output = output
 
         # Initialise prompt session lazily (optional dependency)
         global PromptSession  # noqa: PLW0603 – assign module-level var
@@ -99,17 +113,43 @@ class ChatAgent(AgentCore):
     async def chat_with_llm(self, message: str, conversation: List[Dict[str, str]]):
         """Stream interaction – delegates core logic and prints chunks."""
 
+        output = self._output
+        out = None if output else getattr(sys.stdout, "buffer", None)
+        buf = bytearray()
+        deadline = 0.0
+
+        def _flush() -> None:
+            nonlocal deadline
+            if buf:
+                if output:
+                    output(buf.decode())
+                else:
+                    sys.stdout.flush()  # keep ordering with pending print() output
+                    out.write(buf)
+                    out.flush()
+                buf.clear()
+            deadline = time.monotonic() + _STDOUT_FLUSH_SECS
+
         def _printer(chunk: str):
-            print(chunk, end="", flush=True)
+            if out is None and not output:  # stdout replaced by a text-only stream
+                print(chunk, end="", flush=True)
+                return
+            buf.extend(chunk.encode())
+            if (
+                len(buf) >= _STDOUT_FLUSH_BYTES
+                or chunk.endswith(_FLUSH_ENDINGS)
+                or time.monotonic() >= deadline
+            ):
+                _flush()
 
         try:
-            ollama = importlib.import_module("ollama")  # lazy heavy import
-            client = ollama.AsyncClient(host=str(settings.OLLAMA_BASE_URL))
-        except Exception as exc:
-            logger.warning(f"Could not connect to Ollama: {exc}")
-            client = None
-
-        resp = await super().chat_with_llm(message, conversation, stream_callback=_printer)
+            resp = await super().chat_with_llm(message, conversation, stream_callback=_printer)
+        finally:
+            if out is not None or output:
+                _flush()
         if not resp.endswith("\n"):
-            print()
+            if output:
+                output("\n")
+            else:
+                print()
         return resp 
\ No newline at end of file
@@ -1,8 +1,12 @@
-from typing import Dict, Any, List
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Any, List
 from datetime import datetime
 import json
 from loguru import logger
 
+from ape.settings import settings
+from ape.utils import json_loads
+
 """Context tracking utility used by ChatAgent.
 
 The `ContextManager` stores *verifiable* tool results plus helper values (last
@@ -16,17 +20,26 @@ class ContextManager:
 
     Responsibilities
     -----------------
-    1. Remember every tool invocation (name, args, result, timestamp).
+    1. Remember the most recent tool invocations (name, args, result,
+       timestamp) – at most ``settings.CTX_MAX_TOOL_RESULTS``.
     2. Extract recurring values (e.g. `last_session_id`) so the LLM can refer to
        them without complex JSON parsing.
     3. Provide a compact **human readable** summary for prompt-stuffing.
     """
 
     def __init__(self, session_id: str | None = None):
-        self.session_data: Dict[str, Any] = {}
-        self.tool_results: List[Dict[str, Any]] = []
+        max_results = settings.CTX_MAX_TOOL_RESULTS
+        self.session_data: "OrderedDict[str, Any]" = OrderedDict()
+        self.tool_results: Deque[Dict[str, Any]] = deque(maxlen=max_results)
+        self._max_results = max_results
+        self._result_seq = 0  # monotonic – keys stay unique after eviction
         self.extracted_values: Dict[str, Any] = {}
         self.current_session_id = session_id
+        # Pre-rendered summary lines, kept in step with session_data /
+        # extracted_values so get_context_summary() only joins them.
+        self._session_lines: Dict[str, str] = {}
+        self._value_lines: Dict[str, str] = {}
+        self._summary: str | None = None
 
     def add_tool_result(self, tool_name: str, arguments: dict, result: str):
         """Add a tool result and extract key values."""
@@ -45,59 +58,84 @@ class ContextManager:
         """Extract and structure tool results for better LLM context."""
         try:
             # Store the raw result for LLM to analyze later
-            key = f"{tool_result['tool']}_{len(self.tool_results)}"
+            self._result_seq += 1
+            key = f"{tool_result['tool']}_{self._result_seq}"
             self.session_data[key] = tool_result
+            self._session_lines[key] = (
+                f"- {key}: {tool_result['tool']} (executed at {tool_result['timestamp']})\n"
+            )
+            self._summary = None
+            while len(self.session_data) > self._max_results:
+                self._evict(self.session_data.popitem(last=False)[0])
 
             # Store basic metadata
-            self.extracted_values[f"{key}_timestamp"] = tool_result["timestamp"]
-            self.extracted_values[f"{key}_tool"] = tool_result["tool"]
+            self._set_value(f"{key}_timestamp", tool_result["timestamp"])
+            self._set_value(f"{key}_tool", tool_result["tool"])
 
             # Enhanced value extraction for better LLM context
             if isinstance(tool_result["result"], str):
                 try:
                     # Store JSON results if valid
-                    data = json.loads(tool_result["result"])
-                    self.extracted_values[f"{key}_data"] = data
+                    data = json_loads(tool_result["result"])
+                    self._set_value(f"{key}_data", data)
 
                     # Extract commonly useful values for LLM context
                     if isinstance(data, list) and len(data) > 0:
                         first_item = data[0]
                         if "session_id" in first_item:
-                            self.extracted_values["last_session_id"] = first_item["session_id"]
+                            self._set_value("last_session_id", first_item["session_id"])
                         if "message_count" in first_item:
-                            self.extracted_values["last_message_count"] = first_item["message_count"]
+                            self._set_value("last_message_count", first_item["message_count"])
                         if "total_messages" in first_item:
-                            self.extracted_values["total_messages"] = first_item["total_messages"]
+                            self._set_value("total_messages", first_item["total_messages"])
                         if "total_sessions" in first_item:
-                            self.extracted_values["total_sessions"] = first_item["total_sessions"]
+                            self._set_value("total_sessions", first_item["total_sessions"])
                 except json.JSONDecodeError:
                     # Store raw text if not JSON
-                    self.extracted_values[f"{key}_text"] = tool_result["result"]
+                    self._set_value(f"{key}_text", tool_result["result"])
 
         except Exception as e:
             logger.debug(f"Could not extract values from tool result: {e}")
 
+    def _evict(self, key: str):
+        """Forget an evicted tool result and the per-call values derived from it.
+
+        Semantic values (``last_session_id`` …) are kept; they are overwritten
+        by newer results anyway.
+        """
+        self._session_lines.pop(key, None)
+        for suffix in ("_timestamp", "_tool", "_data", "_text"):
+            self.extracted_values.pop(key + suffix, None)
+            self._value_lines.pop(key + suffix, None)
+
+    def _set_value(self, key: str, value: Any):
+        """Store an extracted value and its pre-rendered summary line."""
+        self.extracted_values[key] = value
+        if isinstance(value, str) and len(value) > 100:
+            self._value_lines[key] = f"- {key}: {value[:100]}...\n"
+        else:
+            self._value_lines[key] = f"- {key}: {value}\n"
+        self._summary = None
+
     def get_context_summary(self) -> str:
         """Get a summary of current context for prompts."""
-        summary = "CURRENT SESSION CONTEXT:\n"
-
-        if self.session_data:
-            summary += "\nAvailable Tool Results:\n"
-            for key, value in self.session_data.items():
-                summary += f"- {key}: {value['tool']} (executed at {value['timestamp']})\n"
-
-        if self.extracted_values:
-            summary += "\nExtracted Values:\n"
-            for key, value in self.extracted_values.items():
-                if isinstance(value, str) and len(value) > 100:
-                    summary += f"- {key}: {str(value)[:100]}...\n"
-                else:
-                    summary += f"- {key}: {value}\n"
-
-        return summary
+        if self._summary is None:
+            parts = ["CURRENT SESSION CONTEXT:\n"]
+            if self._session_lines:
+                parts.append("\nAvailable Tool Results:\n")
+                parts.extend(self._session_lines.values())
+            if self._value_lines:
+                parts.append("\nExtracted Values:\n")
+                parts.extend(self._value_lines.values())
+            self._summary = "".join(parts)
+        return self._summary
 
     def clear(self):
         """Clear the context (for new sessions)."""
         self.session_data.clear()
         self.tool_results.clear()
-        self.extracted_values.clear() 
\ No newline at end of file
+        self.extracted_values.clear()
+        self._result_seq = 0
+        self._session_lines.clear()
+        self._value_lines.clear()
+        self._summary = None 
\ No newline at end of file
@@ -1,17 +1,56 @@
 from __future__ import annotations
 
 import asyncio
+import time
 import traceback
-from typing import Any, Dict, Optional
+from contextlib import AsyncExitStack
+from typing import Any, Dict, Iterable, Optional, Tuple
 
+import anyio
 from loguru import logger
 from mcp import ClientSession
 
-# Reworked to use the MCP SDK's built-in HTTP/SSE client
-# This replaces the old stdio implementation.
+# MCP SDK network clients (the old stdio implementation is gone).
+# Streamable HTTP is the default; SSE is kept for older servers.
 from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
 
 from ape.settings import settings
+from ape.utils import http2_available
+
+# call_tool attempts on a dropped transport (the first try included); the
+# client reconnects between attempts with exponential backoff.
+_CALL_ATTEMPTS = 3
+# Raised by the session's write stream once the transport is gone: the request
+# never left the client, so sending it again is always safe.
+_UNSENT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError)
+# May happen after the server already received the request – only retried for
+# idempotent tools (side effects, LLM time).
+_TRANSIENT_ERRORS = (ConnectionError, asyncio.TimeoutError)
+
+
+def _mcp_http_client(
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Any = None,
+    auth: Any = None,
+):
+    """``httpx_client_factory`` for the MCP transports with an explicit pool.
+
+    The server stream and every ``call_tool`` POST share this client, so keep
+    idle connections around long enough to span a tool loop; HTTP/2 (only
+    negotiated for ``https://`` URLs) multiplexes the POSTs next to the stream.
+    Mirrors the SDK default otherwise (redirects followed, 30 s timeout).
+    """
+    import httpx
+
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=timeout if timeout is not None else httpx.Timeout(30.0),
+        auth=auth,
+        follow_redirects=True,
+        http2=http2_available(),
+        limits=httpx.Limits(max_keepalive_connections=10, keepalive_expiry=30.0),
+    )
 
 
 class MCPClient:
@@ -22,93 +61,345 @@ class MCPClient:
     """
 
     def __init__(self):
-        self._sse_context: Optional[asyncio.AbstractAsyncContextManager] = None
-        self._session_context: Optional[asyncio.AbstractAsyncContextManager] = None
+        # Long-lived task that enters *and* exits the transport and the
+        # ClientSession: their anyio task groups / cancel scopes must be
+        # exited by the task that entered them, whichever task calls
+        # connect(), disconnect() or reconnects.
+        self._owner_task: Optional[asyncio.Task] = None
+        self._close_event: Optional[asyncio.Event] = None
+        # Loop the owner task runs on
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         self.mcp_session: Optional[ClientSession] = None
+        # Bumped on every successful connect so consumers can tell that
+        # server-side state (tools, prompts, resources) may have changed.
+        self.connection_epoch = 0
+        # Set by get_shared_client(): registry key and number of holders
+        self._shared_key: Optional[str] = None
+        self._refcount = 0
+        # kind ("tools"/"prompts"/"resources") -> (expiry, listing result)
+        self._list_cache: Dict[str, Tuple[float, Any]] = {}
+        # kind -> listing RPC in flight; concurrent callers await the same one
+        self._list_inflight: Dict[str, asyncio.Task] = {}
+        # Back-pressure for fan-out: bounds in-flight tool calls on this client
+        self._call_sem = asyncio.Semaphore(settings.MCP_CLIENT_MAX_CONCURRENCY)
+        self._reconnect_lock = asyncio.Lock()
 
     # ---------------------------------------------------------------------
     # Connection management
     # ---------------------------------------------------------------------
     async def connect(self) -> bool:
-        """Connect to the MCP server via HTTP/SSE."""
+        """Connect to the MCP server via streamable HTTP (or legacy SSE)."""
         if self.mcp_session:
             logger.debug("MCPClient.connect(): already connected – skipping")
             return True
 
+        loop = asyncio.get_running_loop()
+        ready: asyncio.Future = loop.create_future()
+        self._loop = loop
+        self._close_event = asyncio.Event()
+        self._owner_task = asyncio.create_task(self._own_connection(ready, self._close_event))
         try:
-            # The server runs on its own, so we connect to its URL
-            server_url = str(settings.MCP_SERVER_URL).rstrip("/") + "/mcp/sse"
-            logger.info(f"🔗 [MCP CLIENT] Connecting to MCP server at {server_url}…")
-
-            # create the SSE transport context by passing the URL directly
-            self._sse_context = sse_client(url=server_url)
-            read, write = await self._sse_context.__aenter__()
-            logger.info("📡 [MCP CLIENT] SSE connection established")
-
-            # wrap the low-level transport in the higher-level ClientSession
-            self._session_context = ClientSession(read, write)
-            self.mcp_session = await self._session_context.__aenter__()
-            logger.info("🤝 [MCP CLIENT] MCP session created")
-
-            # do protocol handshake
-            await self.mcp_session.initialize()
-            logger.info("✅ [MCP CLIENT] MCP connection initialized successfully")
-
-            return True
+            self.mcp_session = await ready
+        except asyncio.CancelledError:
+            self._close_event.set()
+            raise
         except Exception as exc:
             logger.error(f"❌ [MCP CLIENT] Failed to connect to MCP server: {exc}")
             traceback.print_exc()
             # make sure objects are cleaned up in case of partial failure
-            await self.disconnect()
+            await self._close()
             return False
 
+        self._list_cache.clear()
+        self.connection_epoch += 1
+        logger.info("✅ [MCP CLIENT] MCP connection initialized successfully")
+
+        # Every consumer lists the catalog right after connecting: start
+        # those RPCs now so they overlap with the caller's own setup.
+        # (Requests may not precede the initialize handshake.)
+        if settings.MCP_LIST_CACHE_TTL > 0:
+            for kind in ("tools", "prompts", "resources"):
+                self._start_list(kind)
+
+        return True
+
+    async def _own_connection(self, ready: asyncio.Future, closing: asyncio.Event) -> None:
+        """Body of the owner task: open transport + session, hold them until *closing*."""
+        session: Optional[ClientSession] = None
+        try:
+            async with AsyncExitStack() as stack:
+                # The server runs on its own, so we connect to its URL
+                base_url = str(settings.MCP_SERVER_URL).rstrip("/")
+                if settings.MCP_TRANSPORT == "sse":
+                    server_url = base_url + "/mcp/sse"
+                    logger.info(f"🔗 [MCP CLIENT] Connecting to MCP server at {server_url}…")
+                    read, write = await stack.enter_async_context(
+                        sse_client(url=server_url, httpx_client_factory=_mcp_http_client)
+                    )
+                else:
+                    # Each request is a POST answered on its own response – no
+                    # separate long-lived stream to pair it with.
+                    server_url = base_url + "/mcp/http/"
+                    logger.info(f"🔗 [MCP CLIENT] Connecting to MCP server at {server_url}…")
+                    read, write, _ = await stack.enter_async_context(
+                        streamablehttp_client(url=server_url, httpx_client_factory=_mcp_http_client)
+                    )
+                logger.info(f"📡 [MCP CLIENT] {settings.MCP_TRANSPORT} transport established")
+
+                # wrap the low-level transport in the higher-level ClientSession
+                session = await stack.enter_async_context(ClientSession(read, write))
+                logger.info("🤝 [MCP CLIENT] MCP session created")
+
+                # do protocol handshake
+                await session.initialize()
+                if ready.done():  # connect() was cancelled meanwhile
+                    return
+                ready.set_result(session)
+
+                await closing.wait()
+                # Stack unwinds here, in this task: session first, then transport
+            logger.info("📡 [MCP CLIENT] MCP session and transport closed")
+        except Exception as exc:
+            if not ready.done():
+                ready.set_exception(exc)
+            else:
+                logger.warning(f"MCP transport ended with an error: {exc!r}")
+        finally:
+            # A transport that died on its own leaves the client disconnected
+            if session is not None and self.mcp_session is session:
+                self.mcp_session = None
+
+    async def __aenter__(self) -> "MCPClient":
+        """``async with MCPClient() as client:`` – connect, always disconnect."""
+        if not await self.connect():
+            raise ConnectionError("Unable to connect to the MCP server")
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.disconnect()
+
     async def disconnect(self) -> None:
-        """Gracefully close the MCP session and underlying SSE transport."""
+        """Gracefully close the MCP session and underlying HTTP transport.
+
+        For a client obtained from :func:`get_shared_client` this only drops
+        one reference; the connection is closed when the last holder leaves.
+        """
+        # Same lock as get_shared_client: the refcount drop and the registry
+        # removal must not interleave with a caller reusing this entry.
+        async with _SHARED_LOCK:
+            if self._refcount > 1:
+                self._refcount -= 1
+                return
+            self._refcount = 0
+            if self._shared_key is not None and _SHARED.get(self._shared_key) is self:
+                del _SHARED[self._shared_key]
+            self._shared_key = None
+        await self._close()
+
+    async def _close(self) -> None:
+        """Tear down the session and transport (ignores shared references).
+
+        Idempotent: the owner task is detached before it is signalled, so
+        repeated or concurrent calls close it exactly once.  The owner task
+        unwinds the transport itself.  When called from a different event
+        loop than the one that connected (e.g. an atexit hook running its own
+        ``asyncio.run``), the owner task is signalled thread-safely if its loop
+        still runs; otherwise the transport is abandoned with a warning.
+        """
+        task, self._owner_task = self._owner_task, None
+        closing, self._close_event = self._close_event, None
+        owner, self._loop = self._loop, None
+        self.mcp_session = None
+        self._list_cache.clear()
+        for pending in self._list_inflight.values():
+            pending.cancel()
+        self._list_inflight.clear()
+        if task is None:
+            return
+
         try:
-            try:
-                if self._session_context is not None:
-                    await self._session_context.__aexit__(None, None, None)
-                    self._session_context = None
-                    logger.info("🤝 [MCP CLIENT] MCP session closed")
-
-                if self._sse_context is not None:
-                    await self._sse_context.__aexit__(None, None, None)
-                    self._sse_context = None
-                    logger.info("📡 [MCP CLIENT] SSE connection closed")
-            except (RuntimeError, asyncio.CancelledError) as exc:
-                logger.warning(f"Ignoring expected shutdown error: {exc}")
-
-            self.mcp_session = None
+            if owner is asyncio.get_running_loop():
+                closing.set()
+                _, still_open = await asyncio.wait({task}, timeout=5.0)
+                if still_open:
+                    logger.warning("MCP transport did not close within 5 s; cancelling it")
+                    task.cancel()
+            elif owner is not None and owner.is_running():
+                # Event.set is not thread-safe – schedule it on the owner loop,
+                # whose owner task then unwinds the transport itself.
+                owner.call_soon_threadsafe(closing.set)
+                logger.info("MCP transport close signalled to its event loop")
+            else:
+                logger.warning("MCP transport's event loop is gone; abandoning the transport")
             logger.info("✅ [MCP CLIENT] Disconnected successfully")
         except Exception as exc:
             logger.error(f"❌ [MCP CLIENT] Error when disconnecting: {exc}")
 
     # ------------------------------------------------------------------
-    # Convenience pass-through helpers (unchanged)
+    # Convenience pass-through helpers
     # ------------------------------------------------------------------
-    async def list_tools(self):
+    async def _cached_list(self, kind: str):
+        """Return the ``list_<kind>`` result, reusing it for MCP_LIST_CACHE_TTL seconds.
+
+        The catalog is semi-static server metadata, so agents sharing this
+        client (and repeated discoveries) do not each pay an RPC.
+        """
         if not self.mcp_session:
             raise RuntimeError("MCPClient not connected – call connect() first")
-        return await self.mcp_session.list_tools()
+        if (entry := self._list_cache.get(kind)) is not None and time.monotonic() < entry[0]:
+            return entry[1]
+        task = self._list_inflight.get(kind) or self._start_list(kind)
+        # Shielded: one caller being cancelled must not cancel the shared RPC
+        return await asyncio.shield(task)
+
+    def _start_list(self, kind: str) -> asyncio.Task:
+        task = asyncio.create_task(self._fetch_list(kind))
+        # Prefetches may finish unobserved – retrieve their exception
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._list_inflight[kind] = task
+        return task
+
+    async def _fetch_list(self, kind: str):
+        me = asyncio.current_task()
+        try:
+            result = await getattr(self.mcp_session, f"list_{kind}")()
+            # Skip caching if invalidated (or reconnected) while in flight
+            if settings.MCP_LIST_CACHE_TTL > 0 and self._list_inflight.get(kind) is me:
+                self._list_cache[kind] = (time.monotonic() + settings.MCP_LIST_CACHE_TTL, result)
+            return result
+        finally:
+            if self._list_inflight.get(kind) is me:
+                del self._list_inflight[kind]
+
+    def invalidate_listings(self, kinds: Iterable[str] = ("tools", "prompts", "resources")) -> None:
+        """Forget cached listings so the next ``list_*`` call hits the server."""
+        for kind in kinds:
+            self._list_cache.pop(kind, None)
+            self._list_inflight.pop(kind, None)
+
+    async def list_tools(self):
+        return await self._cached_list("tools")
 
     async def list_prompts(self):
-        if not self.mcp_session:
-            raise RuntimeError("MCPClient not connected – call connect() first")
-        return await self.mcp_session.list_prompts()
+        return await self._cached_list("prompts")
 
     async def list_resources(self):
+        return await self._cached_list("resources")
+
+    async def list_all(self, *, return_exceptions: bool = False):
+        """Return ``(tools, prompts, resources)`` listed concurrently.
+
+        The three RPCs are independent, so this costs one round-trip instead
+        of three.  With *return_exceptions* a failing listing is returned in
+        its slot instead of cancelling the others.
+        """
         if not self.mcp_session:
             raise RuntimeError("MCPClient not connected – call connect() first")
-        return await self.mcp_session.list_resources()
+        return tuple(await asyncio.gather(
+            self.list_tools(),
+            self.list_prompts(),
+            self.list_resources(),
+            return_exceptions=return_exceptions,
+        ))
 
-    async def call_tool(self, name: str, arguments: Dict[str, Any]):
-        if not self.mcp_session:
+    async def call_tool(
+        self,
+        name: str,
+        arguments: Dict[str, Any],
+        *,
+        invalidate: Iterable[str] = (),
+        idempotent: Optional[bool] = None,
+    ):
+        """Call tool *name*; *invalidate* names listings the call may change.
+
+        At most ``MCP_CLIENT_MAX_CONCURRENCY`` calls are in flight per client.
+        If the transport drops, the client reconnects and retries (up to
+        ``_CALL_ATTEMPTS`` tries with exponential backoff) – always when the
+        request was never sent, otherwise only for idempotent tools.
+        *idempotent* defaults to the tool's ``readOnlyHint``/``idempotentHint``
+        annotations from the cached listing.
+        """
+        # Hottest method in the agent loop: no logging on the happy path
+        if (session := self.mcp_session) is None:
             raise RuntimeError("MCPClient not connected – call connect() first")
-        return await self.mcp_session.call_tool(name, arguments)
+        async with self._call_sem:
+            try:
+                for attempt in range(_CALL_ATTEMPTS):
+                    epoch = self.connection_epoch
+                    try:
+                        return await session.call_tool(name, arguments)
+                    except _UNSENT_ERRORS + _TRANSIENT_ERRORS as exc:
+                        retryable = isinstance(exc, _UNSENT_ERRORS) or (
+                            self._is_idempotent(name) if idempotent is None else idempotent
+                        )
+                        if not retryable or attempt == _CALL_ATTEMPTS - 1:
+                            raise
+                        logger.warning(f"⚠️ [MCP CLIENT] call_tool({name}) failed ({exc!r}); reconnecting…")
+                        await asyncio.sleep(0.1 * 2 ** attempt)
+                        session = await self._reconnect(epoch)
+            finally:
+                if invalidate:
+                    self.invalidate_listings(invalidate)
+
+    def _is_idempotent(self, name: str) -> bool:
+        """Whether the cached tool listing marks *name* safe to call twice."""
+        if (entry := self._list_cache.get("tools")) is None:
+            return False
+        for tool in entry[1].tools:
+            if tool.name == name:
+                hints = getattr(tool, "annotations", None)
+                return bool(hints and (hints.readOnlyHint or hints.idempotentHint))
+        return False
+
+    async def _reconnect(self, epoch: int) -> ClientSession:
+        """Re-establish the connection unless another caller already did since *epoch*."""
+        async with self._reconnect_lock:
+            if self.connection_epoch == epoch or self.mcp_session is None:
+                await self._close()
+                await self.connect()
+            if self.mcp_session is None:
+                raise ConnectionError("Unable to reconnect to the MCP server")
+            return self.mcp_session
 
     # ------------------------------------------------------------------
     # Helpers / shortcuts
     # ------------------------------------------------------------------
     @property
     def is_connected(self) -> bool:
-        return self.mcp_session is not None
\ No newline at end of file
+        return self.mcp_session is not None
+
+
+# ---------------------------------------------------------------------------
+# Process-wide shared clients
+# ---------------------------------------------------------------------------
+
+_SHARED: Dict[str, MCPClient] = {}
+_SHARED_LOCK = asyncio.Lock()
+
+
+async def get_shared_client(key: str = "default") -> MCPClient:
+    """Return a connected :class:`MCPClient` shared by every caller using *key*.
+
+    Agents in the same process then reuse one MCP transport connection
+    (streamable HTTP or SSE, per ``settings.MCP_TRANSPORT``) and initialised
+    session instead of each paying for its own handshake.  Every call must be
+    paired with one :meth:`MCPClient.disconnect`.
+
+    Raises
+    ------
+    ConnectionError
+        If a new connection to the MCP server cannot be established.
+    """
+    async with _SHARED_LOCK:
+        client = _SHARED.get(key)
+        if client is not None and client.is_connected:
+            client._refcount += 1
+            return client
+
+        client = MCPClient()
+        if not await client.connect():
+            raise ConnectionError("Unable to connect to the MCP server")
+        client._shared_key = key
+        client._refcount = 1
+        _SHARED[key] = client
+        return client
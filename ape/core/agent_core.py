@@ -1,13 +1,160 @@
 from __future__ import annotations
 
-import json
-from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import hmac
+import time
+from collections import deque
+from datetime import datetime
+from operator import attrgetter, itemgetter
 from typing import Any, Dict, List
 
+import jwt  # PyJWT
 from loguru import logger
 
-from ape.utils import count_tokens
+from ape.utils import count_tokens, http2_available, json_dumps, json_loads
 from ape.settings import settings
+from ape.core.response_cache import get_response_cache
+from ape.core.rate_limiter import allow as _rl_allow
+from ape.prompts import list_prompts as _local_list, render_prompt
+
+# HS256 key as bytes, derived once instead of re-encoding the str per result
+_JWT_KEY = settings.MCP_JWT_KEY.encode()
+
+# Literal argument values the LLM may emit as placeholders, mapped to the
+# ContextManager.extracted_values key that supplies the real value.
+_PLACEHOLDERS = {"retrieved_session_id": "last_session_id"}
+
+# Tool-output text returned instead of running calls while MCP is down
+_MCP_NOT_CONNECTED = "❌ MCP client is not connected."
+
+
+def _has_placeholder(arguments: Any) -> bool:
+    """True if any argument value is one of the :data:`_PLACEHOLDERS`."""
+    return isinstance(arguments, dict) and any(
+        isinstance(v, str) and v in _PLACEHOLDERS for v in arguments.values()
+    )
+
+
+# Returned by discover_capabilities() while MCP is down.  A single shared
+# (read-only by convention) object lets the id-keyed prompt caches hit on
+# every degraded-mode turn instead of re-rendering the system prompt.
+_NO_CAPABILITIES: Dict[str, Any] = {"tools": [], "ollama_tools": [], "prompts": [], "resources": []}
+
+
+def _ollama_transport_kwargs() -> Dict[str, Any]:
+    """httpx options for the pooled Ollama client.
+
+    Streams in the tool loop are long-lived, so keep a generous keep-alive
+    pool, retry failed connects and only bound the *connect* phase tightly.
+    HTTP/2 is negotiated via ALPN, i.e. it only takes effect for an
+    ``https://`` ``OLLAMA_BASE_URL``.
+    """
+    import httpx
+
+    limits = httpx.Limits(max_keepalive_connections=40, max_connections=100, keepalive_expiry=30.0)
+    return {
+        "transport": httpx.AsyncHTTPTransport(retries=3, http2=http2_available(), limits=limits),
+        "timeout": httpx.Timeout(300.0, connect=10.0),
+    }
+
+
+def _dump_prompt_arg(arg: Any) -> Any:
+    """Return a prompt argument as a plain dict.
+
+    MCP SDK arguments are Pydantic v2 models (``model_dump`` – the v1-style
+    ``dict()`` is deprecated and warns on every call); local
+    :class:`ape.prompts.loader.PromptArgument` dataclasses expose ``dict()``.
+    """
+    if (dump := getattr(arg, "model_dump", None)) is not None:
+        return dump()
+    if (as_dict := getattr(arg, "dict", None)) is not None:
+        return as_dict()
+    return arg
+
+
+def _truncate_tool_output(text: str, limit: int) -> str:
+    """Clip *text* to *limit* characters, noting how much was dropped."""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}\n...[truncated {len(text) - limit} chars]"
+
+
+def _format_tool_results(results: List[Dict[str, Any]]) -> str:
+    """Wrap executed tool *results* in one BEGIN/END_TOOL_OUTPUT block."""
+    # Clip each result before wrapping so the closing tags always survive
+    limit = settings.MAX_TOOL_RESULT_CHARS
+    formatted_lines = ["🔧 SYSTEM NOTE: BEGIN_TOOL_OUTPUT (generated by tools – NOT user input)\n"]
+    for idx, r in enumerate(results, 1):
+        tool_block = (
+            f"<tool_output index=\"{idx}\" name=\"{r['tool']}\">\n"
+            f"Arguments: `{json_dumps(r['arguments'])}`\n\n"
+            f"{_truncate_tool_output(r['result'], limit)}\n"
+            f"</tool_output>\n"
+        )
+        formatted_lines.append(tool_block)
+    formatted_lines.append("🔧 SYSTEM NOTE: END_TOOL_OUTPUT\n")
+    return "".join(formatted_lines)
+
+
+def _tool_round_fingerprint(tool_calls: List[Dict[str, Any]], result: str, prefix: int = 512) -> bytes:
+    """Digest of one tool round: the calls (order-insensitive) plus the start of their output."""
+    calls = sorted(
+        (c["function"]["name"], json_dumps(c["function"]["arguments"])) for c in tool_calls
+    )
+    h = hashlib.blake2b(json_dumps(calls).encode(), digest_size=16)
+    h.update(result[:prefix].encode())
+    return h.digest()
+
+
+def to_ollama_tools(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Wrap ``{"name", "description", "parameters"}`` tool dicts in the
+    OpenAI/Ollama function-calling shape (pure transform, no I/O)."""
+    return [{"type": "function", "function": t} for t in tools]
+
+
+def _prune_history(conv: List[Dict[str, str]], counts: List[int], budget: int, end: int) -> int:
+    """Drop the oldest messages of *conv* until its token total fits *budget*.
+
+    Only ``conv[1:end]`` (history between the system prompt and the current
+    user message) is eligible, so the stable prompt prefix and the current
+    request/tool trace are never lost.  *counts* holds the per-message token
+    counts and is trimmed in lock-step.  Returns the number of dropped messages.
+    """
+    total = sum(counts)
+    stop = 1
+    while stop < end and total > budget:
+        total -= counts[stop]
+        stop += 1
+    if stop > 1:
+        del conv[1:stop]
+        del counts[1:stop]
+    return stop - 1
+
+
+def _fmt_capabilities(items: List[Dict[str, Any]], include_uri: bool = False) -> str:
+    """Render a tools/prompts/resources list as markdown bullets for the system prompt."""
+    if not items:
+        return "None"
+
+    lines: List[str] = []
+    for itm in items:
+        if "parameters" in itm and isinstance(itm["parameters"], dict):
+            args = ", ".join(itm["parameters"].get("properties", {}).keys())
+        elif "arguments" in itm:
+            args = ", ".join(a.get("name", "?") for a in itm["arguments"])
+        else:
+            args = ""
+        if args:
+            args = f" (args: {args})"
+
+        uri_part = ""
+        if include_uri and "uri" in itm:
+            uri_part = f" (uri: {str(itm['uri'])})"
+
+        lines.append(f"• **{itm['name']}**{uri_part}{args}: {itm['description']}")
+    return "\n".join(lines)
+
 
 class AgentCore:
     """Reusable core engine shared by CLI, web, and other front-ends.
@@ -35,6 +182,40 @@ class AgentCore:
         self.context_limit = context_limit
         self.memory = None
         self.vector_memory = None
+        # Rendered as "session started on" – fixed for the agent's lifetime so
+        # the system prompt stays byte-identical across turns (Ollama reuses
+        # the KV cache of an unchanged prompt prefix).
+        self.session_started = datetime.now().strftime("%Y-%m-%d %H:%M")
+        # Lazily created on first LLM call and reused for every iteration of
+        # the tool loop and every turn so the HTTP keep-alive pool survives.
+        self._ollama_client = None
+        # (monotonic timestamp, MCP connection epoch, capabilities) and
+        # (render key, system prompt)
+        self._cap_cache: tuple[float, int, Dict[str, Any]] | None = None
+        self._prompt_cache: tuple[tuple, str] | None = None
+        self._sections_cache: tuple[int, tuple[str, str, str]] | None = None
+        # (id(capabilities), tokens of the serialised tools payload)
+        self._tools_tokens: tuple[int, int] | None = None
+
+    def _get_ollama_client(self):
+        """Return the shared ``ollama.AsyncClient`` (created on first use)."""
+        if self._ollama_client is None:
+            import ollama
+
+            self._ollama_client = ollama.AsyncClient(
+                host=str(settings.OLLAMA_BASE_URL), **_ollama_transport_kwargs()
+            )
+        return self._ollama_client
+
+    async def aclose(self) -> None:
+        """Close the pooled Ollama HTTP connections (idempotent)."""
+        client, self._ollama_client = self._ollama_client, None
+        if client is None:
+            return
+        try:
+            await client._client.aclose()  # underlying httpx.AsyncClient
+        except Exception as exc:  # pragma: no cover – best-effort shutdown
+            logger.debug(f"Ollama client close failed: {exc}")
 
     async def initialize(self):
         """Initializes the memory modules."""
@@ -99,55 +280,75 @@ class AgentCore:
     # stdout or stdin so that any UI layer can manage display.
     # ------------------------------------------------------------------
 
+    def invalidate_capabilities(self) -> None:
+        """Drop cached capabilities and system prompt (e.g. after MCP reconnect)."""
+        self._cap_cache = None
+        self._prompt_cache = None
+        self._sections_cache = None
+        self._tools_tokens = None
+
     async def discover_capabilities(self) -> Dict[str, Any]:
-        from ape.prompts import list_prompts as _local_list  # local import
 
         # ------------------------------------------------------------------
-        # Simple per-agent cache with 5-minute TTL to avoid a round-trip on
-        # every turn while still reflecting dynamic tool changes.
+        # Per-agent cache, valid for the current MCP connection and at most
+        # settings.MCP_DISCOVERY_TTL seconds – avoids three MCP round-trips on
+        # every turn while still reflecting tool changes and reconnects.
         # ------------------------------------------------------------------
-
-        TTL = timedelta(minutes=5)
-        now = datetime.utcnow()
-
+        now = time.monotonic()
+        epoch = getattr(self.mcp_client, "connection_epoch", 0)
         if (
-            hasattr(self, "_cached_capabilities")
-            and hasattr(self, "_caps_timestamp")
-            and (now - self._caps_timestamp) < TTL
+            self._cap_cache is not None
+            and self._cap_cache[1] == epoch
+            and now - self._cap_cache[0] < settings.MCP_DISCOVERY_TTL
         ):
-            return self._cached_capabilities  # type: ignore[attr-defined]
-
-        capabilities: Dict[str, Any] = {"tools": [], "prompts": [], "resources": []}
+            return self._cap_cache[2]
 
         if not self.mcp_client.is_connected:
             logger.warning("discover_capabilities(): MCP not connected")
-            return capabilities
+            return _NO_CAPABILITIES
+
+        capabilities: Dict[str, Any] = {"tools": [], "ollama_tools": [], "prompts": [], "resources": []}
+
+        # Every list is sorted by name: server order is not guaranteed and a
+        # stable order keeps the system prompt / tools payload byte-identical
+        # across discoveries (Ollama KV prefix reuse, prompt cache hits).
+
+        # The three listings are independent – issue them concurrently so
+        # discovery costs one MCP round-trip instead of three.  Each failure
+        # is handled on its own below (best effort, as before).
+        tools_result, prompts_result, resources_result = await self.mcp_client.list_all(
+            return_exceptions=True
+        )
 
         # Tools
         try:
-            tools_result = await self.mcp_client.list_tools()
+            if isinstance(tools_result, BaseException):
+                raise tools_result
             capabilities["tools"] = [
                 {
                     "name": tool.name,
                     "description": tool.description,
                     "parameters": tool.inputSchema,
                 }
-                for tool in tools_result.tools
+                for tool in sorted(tools_result.tools, key=attrgetter("name"))
             ]
+            # Same data in the OpenAI/Ollama function-calling shape
+            capabilities["ollama_tools"] = to_ollama_tools(capabilities["tools"])
         except Exception as exc:
             logger.error(f"list_tools failed: {exc}")
 
         # Prompts (server may not implement)
         try:
-            prompts_result = await self.mcp_client.list_prompts()
+            if isinstance(prompts_result, BaseException):
+                raise prompts_result
             prompt_items = getattr(prompts_result, "prompts", prompts_result)
             capabilities["prompts"] = [
                 {
                     "name": p.name,
                     "description": p.description,
-                    "arguments": [getattr(arg, "dict", lambda: arg)() for arg in getattr(p, "arguments", [])],
+                    "arguments": [_dump_prompt_arg(arg) for arg in getattr(p, "arguments", None) or []],
                 }
-                for p in prompt_items
+                for p in sorted(prompt_items, key=attrgetter("name"))
             ]
         except Exception:
             try:
@@ -155,97 +356,180 @@ class AgentCore:
                     {
                         "name": prm.name,
                         "description": prm.description,
-                        "arguments": [arg.dict() for arg in prm.arguments],
+                        "arguments": [_dump_prompt_arg(arg) for arg in prm.arguments],
                     }
-                    for prm in _local_list()
+                    for prm in sorted(_local_list(), key=attrgetter("name"))
                 ]
             except Exception as e:
                 logger.error(f"Failed to discover prompts: {e}")
 
         # Resources
         try:
-            resources_result = await self.mcp_client.list_resources()
-            capabilities["resources"] = [
-                res.model_dump() for res in resources_result.resources
-            ]
+            if isinstance(resources_result, BaseException):
+                raise resources_result
+            capabilities["resources"] = sorted(
+                (res.model_dump() for res in resources_result.resources),
+                key=itemgetter("name"),
+            )
         except Exception as e:
             logger.error(f"Failed to discover resources: {e}")
         
-        logger.debug(f"Capabilities resources: {capabilities['resources']}")
+        logger.opt(lazy=True).debug("Capabilities resources: {}", lambda: capabilities["resources"])
 
-        # Cache result with timestamp
-        self._cached_capabilities = capabilities  # type: ignore[attr-defined]
-        self._caps_timestamp = now  # type: ignore[attr-defined]
+        # Cache result with timestamp; the rendered prompt depends on it
+        self._cap_cache = (now, epoch, capabilities)
+        self._prompt_cache = None
+        self._sections_cache = None
+        self._tools_tokens = None
 
         return capabilities
 
     async def create_dynamic_system_prompt(self, capabilities: Dict[str, Any]) -> str:
-        from ape.prompts import render_prompt  # local import
-
-        def _fmt(items: List[Dict[str, Any]], include_uri: bool = False) -> str:
-            if not items:
-                return "None"
-
-            lines: List[str] = []
-            for itm in items:
-                if "parameters" in itm and isinstance(itm["parameters"], dict):
-                    args = ", ".join(itm["parameters"].get("properties", {}).keys())
-                elif "arguments" in itm:
-                    args = ", ".join(a.get("name", "?") for a in itm["arguments"])
-                else:
-                    args = ""
-                if args:
-                    args = f" (args: {args})"
-
-                uri_part = ""
-                if include_uri and "uri" in itm:
-                    uri_part = f" (uri: {str(itm['uri'])})"
-
-                lines.append(f"• **{itm['name']}**{uri_part}{args}: {itm['description']}")
-            return "\n".join(lines)
-
-        tools_section = _fmt(capabilities["tools"])
-        prompts_section = _fmt(capabilities["prompts"])
-        resources_section = _fmt(capabilities["resources"], include_uri=True)
+        role_definition = getattr(self, "role_definition", "")
+        # Expose WindowMemory summary inside the system prompt (M2)
+        memory_summary = getattr(self.memory, "latest_context", lambda: "")()
+
+        key = (id(capabilities), self.agent_name, role_definition, memory_summary)
+        if self._prompt_cache is not None and self._prompt_cache[0] == key:
+            return self._prompt_cache[1]
+
+        # The capability sections only change with *capabilities*; the date
+        # and memory summary are spliced in by the template at render time.
+        if self._sections_cache is None or self._sections_cache[0] != id(capabilities):
+            self._sections_cache = (
+                id(capabilities),
+                (
+                    _fmt_capabilities(capabilities["tools"]),
+                    _fmt_capabilities(capabilities["prompts"]),
+                    _fmt_capabilities(capabilities["resources"], include_uri=True),
+                ),
+            )
+        tools_section, prompts_section, resources_section = self._sections_cache[1]
 
-        return render_prompt(
+        prompt = render_prompt(
             "system",
             {
                 "agent_name": self.agent_name,
-                "current_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "current_date": self.session_started,
                 "tools_section": tools_section,
                 "prompts_section": prompts_section,
                 "resources_section": resources_section,
-                "role_definition": getattr(self, "role_definition", ""),
-                # Expose WindowMemory summary inside the system prompt (M2)
-                "memory_summary": getattr(self.memory, "latest_context", lambda: "")(),
+                "role_definition": role_definition,
+                "memory_summary": memory_summary,
             },
         )
+        self._prompt_cache = (key, prompt)
+        return prompt
 
-    async def get_ollama_tools(self) -> List[Dict[str, Any]]:
-        if not self.mcp_client.is_connected:
-            return []
-        tools_result = await self.mcp_client.list_tools()
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": t.name,
-                    "description": t.description,
-                    "parameters": t.inputSchema,
-                },
-            }
-            for t in tools_result.tools
-        ]
+    async def get_ollama_tools(self, caps: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        """Return tools in Ollama's function-calling shape.
+
+        Derived from *caps* when given, otherwise from the (cached)
+        :meth:`discover_capabilities` result – never a separate ``list_tools``.
+        """
+        if caps is None:
+            caps = await self.discover_capabilities()
+        return caps.get("ollama_tools") or to_ollama_tools(caps.get("tools", []))
 
     # ------------------------------------------------------------------
+    async def _execute_tool(self, fn: str, arguments: Any, sem: asyncio.Semaphore) -> str:
+        """Call MCP tool *fn*, verify its JWT envelope and return the result text."""
+        # Arguments are only rendered if the record is actually emitted
+        logger.bind(agent=self.agent_name).info("Executing tool {} with args {}", fn, arguments)
+        try:
+            async with sem:
+                res = await self.mcp_client.call_tool(fn, arguments)
+            raw = res.content[0].text if res.content else ""
+
+            # verify JWT
+            verified = False
+            payload_text = ""
+            verification_error = ""
+            try:
+                env = json_loads(raw)  # orjson when installed – large SQL dumps
+                token = env.get("jwt") or env.get("sig") or ""
+                if token:
+                    try:
+                        decoded = jwt.decode(token, _JWT_KEY, algorithms=["HS256"])
+                        if (digest := decoded.get("payload_sha256")) is not None:
+                            # Token signs the digest; the payload travels once, in the envelope
+                            candidate = env.get("payload", "")
+                            actual = hashlib.sha256(candidate.encode()).hexdigest()
+                            if not hmac.compare_digest(digest, actual):
+                                raise jwt.InvalidTokenError("payload digest mismatch")
+                            if decoded.get("result_id") != env.get("result_id"):
+                                raise jwt.InvalidTokenError("result_id mismatch")
+                            payload_text = candidate
+                        else:  # legacy tokens embed the payload itself
+                            payload_text = decoded.get("payload") or json_dumps(decoded)
+                        verified = True
+                    except jwt.ExpiredSignatureError as sig_exc:
+                        verification_error = f"Signature expired: {sig_exc}"
+                    except jwt.InvalidTokenError as sig_exc:
+                        verification_error = f"Invalid signature: {sig_exc}"
+                else:
+                    verification_error = "Missing JWT signature in tool result."
+                    payload_text = env.get("payload", "") or raw
+            except Exception as exc_inner:
+                verification_error = f"Malformed tool response: {exc_inner}"
+                payload_text = raw
+
+            if verified:
+                text = payload_text
+            else:
+                # If the tool wrapper returned a plain error string (no JWT), surface it.
+                if payload_text:
+                    text = f"❌ TOOL ERROR: {payload_text.strip()}"
+                else:
+                    text = f"❌ ERROR: Tool result signature verification failed – {verification_error or 'unknown reason.'}"
+            # Log signature verification failure as structured error
+            if not verified:
+                try:
+                    from ape.mcp.session_manager import get_session_manager
+
+                    await get_session_manager().a_save_error(fn, arguments, "Signature verification failed", session_id=self.session_id)
+                except Exception as log_exc:  # pragma: no cover – logging must not break tool flow
+                    logger.debug(f"Could not persist verification error: {log_exc}")
+        except Exception as exc:
+            text = f"ERROR executing tool: {exc}"
+            try:
+                from ape.mcp.session_manager import get_session_manager
+
+                await get_session_manager().a_save_error(fn, arguments, str(exc), session_id=self.session_id)
+            except Exception as log_exc:  # pragma: no cover
+                logger.debug(f"Could not persist tool error: {log_exc}")
+        return text
+
     async def handle_tool_calls(self, tool_calls: List[Dict[str, Any]]):
-        """Execute tool calls and return formatted tool output string."""
+        """Execute tool calls and return formatted tool output string.
+
+        Calls emitted in one LLM turn are dispatched concurrently (bounded by
+        ``settings.MCP_MAX_CONCURRENT_TOOLS``); results are recorded and
+        rendered in the original call order.  A batch that uses placeholders
+        (e.g. ``"retrieved_session_id"``) runs one call at a time instead, so
+        each placeholder resolves against the results of the calls before it.
+        """
 
         if not self.mcp_client.is_connected:
-            return "❌ MCP client is not connected."
+            return _MCP_NOT_CONNECTED
+
+        sem = asyncio.Semaphore(settings.MCP_MAX_CONCURRENT_TOOLS)
+        return _format_tool_results(await self._run_tool_calls(tool_calls, sem))
+
+    async def _run_tool_calls(
+        self, tool_calls: List[Dict[str, Any]], sem: asyncio.Semaphore
+    ) -> List[Dict[str, Any]]:
+        """Execute *tool_calls* and return ``{"tool", "arguments", "result"}`` dicts.
 
+        *sem* bounds the in-flight calls; pass the same one for every batch of
+        a turn so the limit applies per turn.  Each result is recorded in the
+        context manager before this coroutine returns.
+        """
         results: List[Dict[str, Any]] = []
+        # Indices into *results* whose "result" is filled by a dispatched call
+        pending: List[int] = []
+        coros = []
+        sequential = any(_has_placeholder(call["function"]["arguments"]) for call in tool_calls)
 
         for call in tool_calls:
             fn = call["function"]["name"]
@@ -255,8 +539,6 @@ class AgentCore:
             # Rate-limiting (per session) – block excessive tool spam
             # --------------------------------------------------------------
             try:
-                from ape.core.rate_limiter import allow as _rl_allow
-
                 if not _rl_allow(self.session_id):
                     results.append({
                         "tool": fn,
@@ -270,84 +552,30 @@ class AgentCore:
 
             # Simple placeholder substitution using the context manager
             if isinstance(arguments, dict):
-                for k, v in list(arguments.items()):
-                    if (
-                        isinstance(v, str)
-                        and v == "retrieved_session_id"
-                        and "last_session_id" in self.context_manager.extracted_values
-                    ):
-                        arguments[k] = self.context_manager.extracted_values["last_session_id"]
-
-            logger.bind(agent=self.agent_name).info(
-                f"Executing tool {fn} with args {arguments}")
-            try:
-                res = await self.mcp_client.call_tool(fn, arguments)
-                raw = res.content[0].text if res.content else ""
-
-                # verify JWT
-                verified = False
-                payload_text = ""
-                verification_error = ""
-                try:
-                    env = json.loads(raw)
-                    token = env.get("jwt") or env.get("sig") or ""
-                    if token:
-                        import jwt
-                        try:
-                            decoded = jwt.decode(token, settings.MCP_JWT_KEY, algorithms=["HS256"])
-                            verified = True
-                            payload_text = decoded.get("payload") or json.dumps(decoded, ensure_ascii=False)
-                        except jwt.ExpiredSignatureError as sig_exc:
-                            verification_error = f"Signature expired: {sig_exc}"
-                        except jwt.InvalidTokenError as sig_exc:
-                            verification_error = f"Invalid signature: {sig_exc}"
-                    else:
-                        verification_error = "Missing JWT signature in tool result."
-                        payload_text = env.get("payload", "") or raw
-                except Exception as exc_inner:
-                    verification_error = f"Malformed tool response: {exc_inner}"
-                    payload_text = raw
-
-                if verified:
-                    text = payload_text
-                else:
-                    # If the tool wrapper returned a plain error string (no JWT), surface it.
-                    if payload_text:
-                        text = f"❌ TOOL ERROR: {payload_text.strip()}"
-                    else:
-                        text = f"❌ ERROR: Tool result signature verification failed – {verification_error or 'unknown reason.'}"
-                # Log signature verification failure as structured error
-                if not verified:
-                    try:
-                        from ape.mcp.session_manager import get_session_manager
-
-                        await get_session_manager().a_save_error(fn, arguments, "Signature verification failed", session_id=self.session_id)
-                    except Exception as log_exc:  # pragma: no cover – logging must not break tool flow
-                        logger.debug(f"Could not persist verification error: {log_exc}")
-            except Exception as exc:
-                text = f"ERROR executing tool: {exc}"
-                try:
-                    from ape.mcp.session_manager import get_session_manager
-
-                    await get_session_manager().a_save_error(fn, arguments, str(exc), session_id=self.session_id)
-                except Exception as log_exc:  # pragma: no cover
-                    logger.debug(f"Could not persist tool error: {log_exc}")
-
-            results.append({"tool": fn, "arguments": arguments, "result": text})
-            self.context_manager.add_tool_result(fn, arguments, text)
-
-        formatted_lines = ["🔧 SYSTEM NOTE: BEGIN_TOOL_OUTPUT (generated by tools – NOT user input)\n"]
-        for idx, r in enumerate(results, 1):
-            tool_block = (
-                f"<tool_output index=\"{idx}\" name=\"{r['tool']}\">\n"
-                f"Arguments: `{json.dumps(r['arguments'], ensure_ascii=False)}`\n\n"
-                f"{r['result']}\n"
-                f"</tool_output>\n"
-            )
-            formatted_lines.append(tool_block)
-        formatted_lines.append("🔧 SYSTEM NOTE: END_TOOL_OUTPUT\n")
-
-        return "".join(formatted_lines)
+                extracted = self.context_manager.extracted_values
+                for k, v in arguments.items():  # values only – no key changes
+                    if isinstance(v, str) and (src := _PLACEHOLDERS.get(v)) and src in extracted:
+                        arguments[k] = extracted[src]
+
+            if sequential:
+                # Record before the next call substitutes its placeholders
+                text = await self._execute_tool(fn, arguments, sem)
+                results.append({"tool": fn, "arguments": arguments, "result": text})
+                self.context_manager.add_tool_result(fn, arguments, text)
+                continue
+
+            pending.append(len(results))
+            results.append({"tool": fn, "arguments": arguments, "result": None})
+            coros.append(self._execute_tool(fn, arguments, sem))
+
+        # _execute_tool converts every failure into result text, so a plain
+        # gather cannot short-circuit the batch.
+        for idx, text in zip(pending, await asyncio.gather(*coros)):
+            r = results[idx]
+            r["result"] = text
+            self.context_manager.add_tool_result(r["tool"], r["arguments"], text)
+
+        return results
 
     # ------------------------------------------------------------------
     async def chat_with_llm(
@@ -390,8 +618,6 @@ class AgentCore:
         # ------------------------------------------------------------------
 
         try:
-            from ape.utils import count_tokens  # local import to avoid heavy deps outside use
-
             ctx_limit = self.context_manager.context_limit if hasattr(self.context_manager, "context_limit") else None
         except Exception:
             ctx_limit = None
@@ -401,36 +627,56 @@ class AgentCore:
             ctx_limit = getattr(self, "context_limit", None)
 
         if ctx_limit:
-            margin = settings.CONTEXT_MARGIN_TOKENS
-            total = sum(count_tokens(m["content"]) for m in exec_conversation)
-            if total > ctx_limit - margin:
-                # remove oldest assistant/user pairs until within budget
-                # skip first element (system prompt)
-                pruned_conv = exec_conversation[1:-1]  # messages between system and user message
-                # pop from start until fits
-                while pruned_conv and total > ctx_limit - margin:
-                    removed = pruned_conv.pop(0)
-                    total -= count_tokens(removed["content"])
-                exec_conversation = [exec_conversation[0], *pruned_conv, exec_conversation[-1]]
+            # The tools schema is sent with every request and occupies context
+            # too; it only changes with the capabilities, so count it once.
+            if self._tools_tokens is None or self._tools_tokens[0] != id(capabilities):
+                try:
+                    n_tools = count_tokens(json_dumps(capabilities["tools"])) if capabilities["tools"] else 0
+                except Exception:
+                    n_tools = 0
+                self._tools_tokens = (id(capabilities), n_tools)
+            budget = ctx_limit - settings.CONTEXT_MARGIN_TOKENS - self._tools_tokens[1]
+
+            # count_tokens is memoised, so replayed history is tokenized once
+            counts: List[int] = [count_tokens(m["content"]) for m in exec_conversation]
+
+            # remove oldest assistant/user pairs until within budget, keeping
+            # the system prompt and the new user message
+            _prune_history(exec_conversation, counts, budget, len(exec_conversation) - 1)
+        # Index of the current user message – tool iterations append after it
+        user_idx = len(exec_conversation) - 1
         # ------------------------------------------------------------------
 
-        try:
-            tools_tokens = count_tokens(json.dumps(capabilities["tools"]))
-        except Exception:
-            tools_tokens = 0
-
-        import ollama
+        # Exact-match response cache (low-temperature, tool-free answers only)
+        response_cache = get_response_cache()
+        cache_key = None
+        if response_cache is not None:
+            cache_key = response_cache.make_key(exec_conversation)
+            if (cached := response_cache.get(cache_key)) is not None:
+                logger.bind(agent=self.agent_name).debug("Response cache hit")
+                if stream_callback:
+                    stream_callback(cached)
+                if hasattr(self, "memory") and self.memory:
+                    self.memory.add({"role": "assistant", "content": cached})
+                return cached
 
-        client = ollama.AsyncClient(host=str(settings.OLLAMA_BASE_URL))
-        # Normalised tools payload (OpenAI spec) – avoids 500 JSON errors
-        tools_spec = await self.get_ollama_tools()
+        client = self._get_ollama_client()
+        # Normalised tools payload (OpenAI spec) – avoids 500 JSON errors.
+        # Omitted entirely (None) when there are no tools, e.g. MCP is down.
+        tools_spec = capabilities["ollama_tools"] or None
 
         max_iter = settings.MAX_TOOLS_ITERATIONS
         iteration = 0
         cumulative_resp = ""
+        # Fingerprints of the last tool rounds – a repeat means the model is
+        # looping on the same call/result and another re-stream is wasted.
+        recent_rounds: deque[bytes] = deque(maxlen=2)
+        cycled = False
 
         while iteration < max_iter:
-            current_chunk = ""
+            # Streamed content of the current assistant message; joined once
+            # instead of growing a str by += per token.
+            chunk_parts: List[str] = []
             has_tool_calls = False
 
             try:
@@ -526,7 +772,7 @@ class AgentCore:
                 if content := msg.get("content"):
                     if stream_callback:
                         stream_callback(content)
-                    current_chunk += content
+                    chunk_parts.append(content)
 
                 # ------------------------------------------------------------------
                 # Tool calling – handle both plural "tool_calls" (OpenAI/Qwen spec)
@@ -537,29 +783,92 @@ class AgentCore:
                     has_tool_calls = True
                     iteration += 1
 
-                    if current_chunk:
-                        exec_conversation.append({"role": "assistant", "content": current_chunk})
-                        cumulative_resp += current_chunk + "\n"
-                        current_chunk = ""
-
                     # Convert single dict to list for downstream handler API
                     if not isinstance(tool_calls_payload, list):
                         tool_calls_payload = [tool_calls_payload]
+                    tool_calls_payload = list(tool_calls_payload)
+
+                    # Dispatch the tools right away and drain the rest of this
+                    # stream (trailing content, late tool calls, final stats)
+                    # while they run – this also releases the HTTP response
+                    # instead of abandoning it mid-stream.  Late calls run
+                    # after the first batch has recorded its results, under
+                    # the same per-turn semaphore, and everything is
+                    # formatted as one tool-output block.
+                    sem = asyncio.Semaphore(settings.MCP_MAX_CONCURRENT_TOOLS)
+                    tool_task = (
+                        asyncio.create_task(self._run_tool_calls(list(tool_calls_payload), sem))
+                        if self.mcp_client.is_connected else None
+                    )
+                    late_calls: List[Dict[str, Any]] = []
+                    try:
+                        async for rest in stream:
+                            if thinking := rest.get("thinking"):
+                                if stream_callback:
+                                    stream_callback(thinking)
+                            rest_msg = rest.get("message") or {}
+                            if content := rest_msg.get("content"):
+                                if stream_callback:
+                                    stream_callback(content)
+                                chunk_parts.append(content)
+                            if more := rest_msg.get("tool_calls") or rest_msg.get("tool_call"):
+                                more = more if isinstance(more, list) else [more]
+                                tool_calls_payload.extend(more)
+                                late_calls.extend(more)
+                    except BaseException:
+                        if tool_task is not None:
+                            tool_task.cancel()
+                        raise
+
+                    if chunk_parts:
+                        current_chunk = "".join(chunk_parts)
+                        chunk_parts.clear()
+                        exec_conversation.append({"role": "assistant", "content": current_chunk})
+                        cumulative_resp += current_chunk + "\n"
+                        if ctx_limit:
+                            counts.append(count_tokens(current_chunk))
 
-                    tool_result_str = await self.handle_tool_calls(tool_calls_payload)
+                    if tool_task is None:
+                        tool_result_str = _MCP_NOT_CONNECTED
+                    else:
+                        results = await tool_task
+                        if late_calls:
+                            results += await self._run_tool_calls(late_calls, sem)
+                        tool_result_str = _format_tool_results(results)
                     if stream_callback:
                         stream_callback("\n" + tool_result_str)
+
+                    fingerprint = _tool_round_fingerprint(tool_calls_payload, tool_result_str)
+                    if fingerprint in recent_rounds:
+                        logger.warning(
+                            f"🔁 Tool loop detected after {iteration} iteration(s) – "
+                            "same calls returned the same output; stopping."
+                        )
+                        cycled = True
+                        break
+                    recent_rounds.append(fingerprint)
+
                     exec_conversation.append({"role": "tool", "content": tool_result_str})
+
+                    # The next iteration re-sends everything: keep it in budget
+                    # by dropping older history rather than overflowing the model.
+                    if ctx_limit:
+                        counts.append(count_tokens(tool_result_str))
+                        user_idx -= _prune_history(exec_conversation, counts, budget, user_idx)
                     break
 
-            if not has_tool_calls:
-                if current_chunk:
-                    cumulative_resp += current_chunk
+            if not has_tool_calls or cycled:
+                if chunk_parts:
+                    cumulative_resp += "".join(chunk_parts)
 
                 # Store assistant answer in WindowMemory (if enabled)
                 if hasattr(self, "memory") and self.memory:
                     self.memory.add({"role": "assistant", "content": cumulative_resp})
 
+                # Tool-backed answers may depend on data that changes – skip
+                if cache_key is not None and iteration == 0 and cumulative_resp:
+                    response_cache.put(cache_key, cumulative_resp)
+
                 break
 
-        return cumulative_resp 
\ No newline at end of file
+        return cumulative_resp 
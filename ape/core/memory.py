@@ -26,10 +26,9 @@ from abc import ABC, abstractmethod
 from typing import Dict, List
 from loguru import logger
 import re
-import json
 
 from ape.settings import settings
-from ape.utils import count_tokens
+from ape.utils import count_tokens, json_loads
 
 # ---------------------------------------------------------------------------
 # Abstract base class
@@ -83,17 +82,47 @@ class WindowMemory(AgentMemory):
         self.messages: List[Dict[str, str]] = []  # raw recent messages
         self.summary: str = ""  # cumulative summary text
 
+        # Token counts kept in lock-step with *messages* / *summary* so that
+        # tokens() – polled on every prune step – never re-tokenises history.
+        self._msg_tokens: List[int] = []
+        self._raw_total: int = 0
+        self._summary_tok: tuple[str, int] = ("", 0)
+
     # ------------------------------------------------------------------
     # Public helpers
     # ------------------------------------------------------------------
 
     def add(self, message: Dict[str, str]) -> None:
         self.messages.append(message)
+        n = count_tokens(message["content"])
+        self._msg_tokens.append(n)
+        self._raw_total += n
+
+    def raw_tokens(self) -> int:
+        """Token footprint of the verbatim messages."""
+        if len(self._msg_tokens) != len(self.messages):
+            # *messages* was modified behind our back – recount once
+            self._msg_tokens = [count_tokens(m["content"]) for m in self.messages]
+            self._raw_total = sum(self._msg_tokens)
+        return self._raw_total
+
+    def summary_tokens(self) -> int:
+        """Token footprint of the cumulative summary."""
+        text, n = self._summary_tok
+        if text is not self.summary:
+            n = count_tokens(self.summary)
+            self._summary_tok = (self.summary, n)
+        return n
 
     def tokens(self) -> int:
-        raw_tok = sum(count_tokens(m["content"]) for m in self.messages)
-        summary_tok = count_tokens(self.summary)
-        return raw_tok + summary_tok
+        return self.raw_tokens() + self.summary_tokens()
+
+    def _drop_oldest(self, count: int) -> None:
+        """Remove the *count* oldest messages and their token counts."""
+        self.raw_tokens()  # resync if needed
+        del self.messages[:count]
+        self._raw_total -= sum(self._msg_tokens[:count])
+        del self._msg_tokens[:count]
 
     async def summarize(self, text: str) -> str:  # noqa: D401 – imperative docstring OK
         """Delegate to the *summarize_text* tool via MCP (async)."""
@@ -104,10 +133,10 @@ class WindowMemory(AgentMemory):
 
             # Tool results are wrapped in a JSON envelope with signature; extract payload
             try:
-                env = json.loads(raw)
+                env = json_loads(raw)
                 payload = env.get("payload", raw)
                 # payload itself is JSON of ToolResult – result field holds the summary
-                tr = json.loads(payload)
+                tr = json_loads(payload)
                 return tr.get("result", payload)
             except Exception:
                 return raw
@@ -142,14 +171,17 @@ class WindowMemory(AgentMemory):
                         await sm.a_save_summary(self.session_id, chunk, summary_text)
 
                     # Now, safely remove the original messages from memory
-                    del self.messages[:batch_size]
+                    self._drop_oldest(batch_size)
 
                     # And append the new summary to the cumulative in-memory summary
                     self.summary += ("\n" if self.summary else "") + summary_text
 
-                    logger.debug(
-                        f"[MEM] session={self.session_id or '-'} summarised_msgs={batch_size} "
-                        f"total_tokens={self.tokens()}"
+                    # Lazy: only pay for the log record when DEBUG is emitted.
+                    logger.opt(lazy=True).debug(
+                        "[MEM] session={} summarised_msgs={} total_tokens={}",
+                        lambda: self.session_id or "-",
+                        lambda: batch_size,
+                        self.tokens,
                     )
 
                 except Exception as exc:
@@ -185,7 +217,7 @@ class WindowMemory(AgentMemory):
                     await sm.a_save_summary(self.session_id, chunk, summary_text)
 
                 # Clear the entire message buffer
-                self.messages.clear()
+                self._drop_oldest(len(self.messages))
 
                 # Append the new summary
                 self.summary += ("\n" if self.summary else "") + summary_text
@@ -0,0 +1,85 @@
+"""In-process exact-match cache for final LLM answers.
+
+Repeated, functionally identical turns (same model + sampling settings, same
+system prompt, same conversation tail, same user message) are answered from
+memory instead of re-running the full Ollama stream.  Entries live in a small
+LRU with a TTL; the cache is deliberately process-local and dependency-free.
+
+Only deterministic-enough turns are cached (temperature at or below
+``settings.RESPONSE_CACHE_MAX_TEMPERATURE``) and only answers produced without
+tool calls are stored – a tool-backed answer may depend on data that has
+changed since.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ape.settings import settings
+
+# Number of trailing conversation messages folded into the key
+TAIL_MESSAGES: int = 6
+
+
+class ResponseCache:
+    """LRU + TTL mapping from a conversation fingerprint to the final answer."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(messages: List[Dict[str, str]]) -> str:
+        """Return the cache key for *messages* (system prompt first, user message last)."""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(
+            f"{settings.LLM_MODEL}\0{settings.TEMPERATURE}\0{settings.TOP_P}\0{settings.TOP_K}\0".encode()
+        )
+        system, tail = messages[0], messages[1:][-(TAIL_MESSAGES + 1):]
+        for m in (system, *tail):
+            h.update(m["role"].encode())
+            h.update(b"\0")
+            h.update(m["content"].encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, response = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def put(self, key: str, response: str) -> None:
+        self._entries[key] = (time.monotonic(), response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Return the process-wide cache, or *None* when caching is disabled.
+
+    Disabled when ``RESPONSE_CACHE_SIZE`` is 0 or the configured temperature
+    makes answers non-reproducible.
+    """
+    global _cache
+    if settings.RESPONSE_CACHE_SIZE <= 0 or settings.TEMPERATURE > settings.RESPONSE_CACHE_MAX_TEMPERATURE:
+        return None
+    if _cache is None:
+        _cache = ResponseCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL)
+    return _cache
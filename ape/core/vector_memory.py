@@ -20,6 +20,9 @@ class VectorMemory:
         self.metadata_path = os.path.join(settings.VECTOR_DB_PATH, "metadata.json")
         self.index: faiss.Index | None = None
         self.metadata: Dict[int, Dict[str, Any]] = {}
+        # Serialises index mutation + persistence now that both run partly in
+        # worker threads (id assignment must not race with write_index).
+        self._lock = asyncio.Lock()
 
         if settings.EMBEDDING_SIZE:
             self.embedding_dimension = settings.EMBEDDING_SIZE
@@ -59,17 +62,20 @@ class VectorMemory:
     async def _embed_and_store(self, text: str, metadata: dict | None = None):
         """The actual workhorse, designed to be run in the background."""
         try:
-            embedding = self.ollama_client.embeddings(
+            # The Ollama client is synchronous – keep the HTTP call off the loop
+            embedding = (await asyncio.to_thread(
+                self.ollama_client.embeddings,
                 model=settings.EMBEDDING_MODEL,
-                prompt=text
-            )['embedding']
+                prompt=text,
+            ))['embedding']
 
             if self.index is not None:
                 vector = np.array([embedding], dtype=np.float32)
-                new_id = self.index.ntotal
-                self.index.add(vector)
-                self.metadata[new_id] = {"text": text, "metadata": metadata}
-                self._save_storage()
+                async with self._lock:
+                    new_id = self.index.ntotal
+                    self.index.add(vector)
+                    self.metadata[new_id] = {"text": text, "metadata": metadata}
+                    await asyncio.to_thread(self._save_storage)
                 logger.info(f"Successfully embedded and stored text: {text[:50]}...")
         except Exception as e:
             logger.error(f"Background embedding task failed: {e}")
@@ -87,13 +93,15 @@ class VectorMemory:
         if self.index is None or self.index.ntotal == 0:
             return []
 
-        query_embedding = self.ollama_client.embeddings(
+        query_embedding = (await asyncio.to_thread(
+            self.ollama_client.embeddings,
             model=settings.EMBEDDING_MODEL,
-            prompt=query
-        )['embedding']
-        
+            prompt=query,
+        ))['embedding']
+
         query_vector = np.array([query_embedding], dtype=np.float32)
-        distances, indices = self.index.search(query_vector, top_k)
+        async with self._lock:
+            distances, indices = self.index.search(query_vector, top_k)
 
         results = []
         for i, dist in zip(indices[0], distances[0]):
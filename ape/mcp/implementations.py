@@ -8,7 +8,6 @@ blocking inside the event-loop.
 """
 
 import aiosqlite
-import json
 import uuid
 from datetime import datetime, timedelta
 from typing import Optional
@@ -18,6 +17,7 @@ from loguru import logger
 
 from .session_manager import get_session_manager
 from ape.settings import settings
+from ape.utils import json_dumps
 from ape.errors import DatabaseError, ToolExecutionError
 from ape.core.vector_memory import get_vector_memory
 from ape.resources import list_resources as _list_resources
@@ -86,7 +86,7 @@ async def execute_database_query_impl(sql_query: str) -> str:
             
             results = [dict(zip(columns, row)) for row in rows]
             logger.info(f"✅ [IMPL] SELECT query returned {len(results)} rows")
-            return f"QUERY_RESULT: {json.dumps(results, indent=2, default=str)}"
+            return f"QUERY_RESULT: {json_dumps(results, indent=True)}"
             
     except aiosqlite.Error as e:
         logger.error(f"💥 [IMPL] Database error: {e}")
@@ -140,7 +140,7 @@ async def get_conversation_history_impl(session_id: str = None, limit: int = 10)
             })
         
         logger.info(f"✅ [IMPL] Conversation history retrieved successfully, {len(history)} messages")
-        return json.dumps(history, indent=2)
+        return json_dumps(history, indent=True)
         
     except Exception as e:
         logger.error(f"💥 [IMPL] Error getting conversation history: {e}")
@@ -160,11 +160,11 @@ async def get_database_info_impl() -> str:
             tables = await cursor.fetchall()
             
             if not tables:
-                return json.dumps({
+                return json_dumps({
                     "database_path": DB_PATH,
                     "status": "Database exists but contains no tables",
                     "tables": []
-                }, indent=2)
+                }, indent=True)
             
             # Get schema and stats for each table
             database_info = {
@@ -229,7 +229,7 @@ async def get_database_info_impl() -> str:
                     }
         
         logger.info(f"✅ [IMPL] Database info retrieved successfully")
-        return json.dumps(database_info, indent=2)
+        return json_dumps(database_info, indent=True)
         
     except Exception as e:
         logger.error(f"💥 [IMPL] Error getting database info: {e}")
@@ -277,7 +277,7 @@ async def search_conversations_impl(query: str, limit: int = 5) -> str:
             })
         
         logger.info(f"✅ [IMPL] Search completed successfully, {len(results)} results found")
-        return json.dumps(results, indent=2)
+        return json_dumps(results, indent=True)
         
     except Exception as e:
         logger.error(f"💥 [IMPL] Error searching conversations: {e}")
@@ -660,7 +660,7 @@ async def list_available_resources_impl() -> str:
     logger.info("📚 [IMPL] Getting list of available resources")
     try:
         resources = [meta.to_dict() for meta in _list_resources()]
-        return json.dumps(resources, indent=2)
+        return json_dumps(resources, indent=True)
     except Exception as e:
         logger.error(f"❌ [IMPL] Error getting resource list: {e}")
         raise ValueError(f"Failed to get resource list: {str(e)}")
\ No newline at end of file
@@ -2,6 +2,7 @@
 
 import json
 import asyncio
+import hashlib
 import time
 from typing import Any, Sequence
 from uuid import uuid4
@@ -13,7 +14,7 @@ from mcp.server import NotificationOptions, Server
 import mcp.server.stdio
 
 from loguru import logger
-from ape.utils import setup_logger
+from ape.utils import json_dumps, json_loads, setup_logger
 
 from .plugin import discover
 from . import implementations_builtin
@@ -36,7 +37,7 @@ def create_mcp_server() -> Server:
     server = Server("ape-server")
     registry = discover()
 
-    SECRET = settings.MCP_JWT_KEY  # str
+    SECRET = settings.MCP_JWT_KEY.encode()  # bytes – encoded once, not per signature
 
     def _encode_token(data: dict) -> str:
         """Return HS256-signed JWT containing *data* plus issued-at timestamp."""
@@ -94,12 +95,15 @@ def create_mcp_server() -> Server:
 
             try:
                 # Try to parse it as JSON, so it gets embedded as an object/array
-                result_data = json.loads(result_from_impl)
+                result_data = json_loads(result_from_impl)
             except (json.JSONDecodeError, TypeError):
                 # If it's not JSON, treat it as a plain string
                 result_data = result_from_impl
 
-            # Wrap successful result in a ToolResult and HMAC-signed envelope
+            # Wrap successful result in a ToolResult and JWT-signed envelope.
+            # The token signs a SHA-256 digest of the payload rather than the
+            # payload itself, so large results are not shipped twice (once
+            # verbatim, once base64-encoded inside the JWT).
             payload_str = ToolResult(
                 tool=name,
                 arguments=arguments,
@@ -109,10 +113,13 @@ def create_mcp_server() -> Server:
             envelope = {
                 "result_id": rid,
                 "payload": payload_str,
-                "sig": _encode_token({"result_id": rid, "payload": payload_str}),
+                "sig": _encode_token({
+                    "result_id": rid,
+                    "payload_sha256": hashlib.sha256(payload_str.encode()).hexdigest(),
+                }),
             }
 
-            return [types.TextContent(type="text", text=json.dumps(envelope))]
+            return [types.TextContent(type="text", text=json_dumps(envelope))]
 
         except Exception as e:
             logger.error(f"💥 [MCP SERVER] Error handling tool {name}: {e}")
@@ -216,16 +223,19 @@ def create_mcp_server() -> Server:
 
 
 async def run_server():
-    """Run the MCP server via HTTP/SSE."""
+    """Run the MCP server via streamable HTTP and HTTP/SSE."""
+    import contextlib
+
     import uvicorn
     from starlette.applications import Starlette
     from starlette.routing import Route, Mount
     from starlette.responses import Response
     from starlette.requests import Request
     from mcp.server.sse import SseServerTransport
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
 
     setup_logger()
-    logger.info("🚀 [MCP SERVER] Starting APE MCP Server via HTTP/SSE...")
+    logger.info("🚀 [MCP SERVER] Starting APE MCP Server via streamable HTTP + SSE...")
 
     # Initialize Vector Memory
     await get_vector_memory()
@@ -250,13 +260,30 @@ async def run_server():
     async def sse_endpoint(request: Request):
         return await handle_sse_connection(request.scope, request.receive, request._send)
 
-    # 4. Create a Starlette app to host the SSE endpoints
-    #    GET /mcp/sse - The client connects here to start the event stream.
-    #    POST /mcp/messages/{session_id} - The client sends messages here.
-    app = Starlette(routes=[
-        Route("/mcp/sse", endpoint=sse_endpoint, methods=["GET"]),
-        Mount("/mcp/messages", app=sse_transport.handle_post_message),
-    ])
+    # 3b. Streamable HTTP: every request is a single POST whose response
+    #     carries the result – the default client transport.
+    http_manager = StreamableHTTPSessionManager(app=server)
+
+    async def handle_streamable_http(scope, receive, send):
+        await http_manager.handle_request(scope, receive, send)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(_app):
+        async with http_manager.run():
+            yield
+
+    # 4. Create a Starlette app to host the endpoints
+    #    /mcp/http/ - Streamable HTTP endpoint (POST/GET/DELETE).
+    #    GET /mcp/sse - Legacy SSE: the client connects here to start the event stream.
+    #    POST /mcp/messages/{session_id} - Legacy SSE: the client sends messages here.
+    app = Starlette(
+        routes=[
+            Mount("/mcp/http", app=handle_streamable_http),
+            Route("/mcp/sse", endpoint=sse_endpoint, methods=["GET"]),
+            Mount("/mcp/messages", app=sse_transport.handle_post_message),
+        ],
+        lifespan=lifespan,
+    )
 
     # 5. Run the app with uvicorn
     config = uvicorn.Config(app, host="0.0.0.0", port=settings.PORT)
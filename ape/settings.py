@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic import Field, HttpUrl
 from pydantic_settings import BaseSettings
 from pydantic import model_validator
@@ -13,6 +15,7 @@ class Settings(BaseSettings):
     PORT: int = Field(8000, description="HTTP port for MCP server")
     LOG_LEVEL: str = Field("DEBUG", description="Root log level for Loguru")
     MCP_SERVER_URL: HttpUrl = Field("http://localhost:8000", description="URL of the APE MCP server")
+    MCP_TRANSPORT: Literal["streamable-http", "sse"] = Field("streamable-http", description="Client transport: 'streamable-http' (/mcp/http/) or legacy 'sse' (/mcp/sse)")
 
     # LLM / Ollama
     OLLAMA_BASE_URL: HttpUrl = Field("http://localhost:11434", description="Base URL of the local Ollama server")
@@ -24,6 +27,15 @@ class Settings(BaseSettings):
     TOP_P: float = Field(0.9, description="Nucleus sampling parameter (probability mass)")
     TOP_K: int = Field(40, description="Top-K sampling parameter (number of candidates)")
     MAX_TOOLS_ITERATIONS: int = Field(15, description="Max reasoning/tool iterations per user prompt")
+    RESPONSE_CACHE_SIZE: int = Field(256, description="Max cached final LLM answers (exact-match, in-process); 0 disables the cache", ge=0)
+    RESPONSE_CACHE_TTL: float = Field(600.0, description="Seconds a cached LLM answer stays valid")
+    RESPONSE_CACHE_MAX_TEMPERATURE: float = Field(0.2, description="Response cache is only used when TEMPERATURE is at or below this value; with the default TEMPERATURE (0.5) the cache is off unless this is raised")
+    MAX_TOOL_RESULT_CHARS: int = Field(12000, description="Tool output fed back to the LLM per iteration is truncated to this many characters", ge=256)
+    CTX_MAX_TOOL_RESULTS: int = Field(50, description="Most recent tool results kept in the session context (older ones are evicted from the prompt summary)", ge=1)
+    MCP_MAX_CONCURRENT_TOOLS: int = Field(4, description="Max tool calls from one LLM turn executed concurrently over MCP", ge=1)
+    MCP_CLIENT_MAX_CONCURRENCY: int = Field(16, description="Max in-flight call_tool requests per MCPClient (shared by all agents using it)", ge=1)
+    MCP_LIST_CACHE_TTL: float = Field(60.0, description="Seconds MCPClient reuses list_tools/list_prompts/list_resources results (0 disables)", ge=0)
+    MCP_DISCOVERY_TTL: float = Field(300.0, description="Seconds an agent reuses discovered MCP tools/prompts/resources before re-listing them")
 
     # UI (CLI) options
     UI_THEME: str = Field("dark", description="CLI theme (dark/light)")
@@ -1,6 +1,7 @@
 import base64
+import json
 from io import BytesIO
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 from loguru import logger
 from functools import lru_cache
 from ape.logging import setup_logger  # re-export central function
@@ -8,6 +9,90 @@ from ape.logging import setup_logger  # re-export central function
 if TYPE_CHECKING:  # pragma: no cover – typing only
     from PIL import Image  # noqa: F401
 
+# Optional C-accelerated JSON backend (``pip install ape-mcp[speedups]``)
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover – stdlib fallback
+    orjson = None
+
+
+def json_dumps(obj: Any, *, indent: bool = False) -> str:
+    """Serialise *obj* to a JSON ``str`` using *orjson* when available.
+
+    Both backends produce the same text, so tool results (and the digests
+    signed over them) do not depend on whether the optional extra is
+    installed:
+
+    * non-ASCII characters are emitted verbatim (``ensure_ascii=False``);
+    * separators are compact (``","`` / ``":"``); *indent* switches to a
+      two-space pretty-printed layout;
+    * datetimes and dataclasses go through ``default=str`` rather than
+      orjson's native ISO/dict encoding;
+    * non-``str`` dict keys (e.g. ``None`` from SQL aggregates) are accepted.
+
+    Anything orjson still rejects, such as integers beyond 64 bits, falls
+    back to the stdlib.  Remaining known difference: non-finite floats
+    (``NaN``/``Infinity``) become ``null`` under orjson but are written
+    verbatim by the stdlib; SQLite stores them as ``NULL`` anyway.
+    """
+    if orjson is not None:
+        option = (
+            orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+            | (orjson.OPT_INDENT_2 if indent else 0)
+        )
+        try:
+            return orjson.dumps(obj, option=option, default=str).decode()
+        except TypeError:
+            pass
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        indent=2 if indent else None,
+        separators=(",", ": ") if indent else (",", ":"),
+        default=str,
+    )
+
+
+def json_loads(data: str | bytes) -> Any:
+    """Parse JSON *data* (``str`` or ``bytes``) using *orjson* when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def use_uvloop() -> bool:
+    """Switch asyncio to *uvloop* when it is installed; return whether it is used.
+
+    Call before ``asyncio.run``.  The MCP SSE stream and the Ollama streams are
+    pure event-loop socket I/O, which uvloop handles noticeably faster.  Not
+    available on Windows – the default loop is kept there.
+    """
+    try:
+        import uvloop  # type: ignore  # ``pip install ape-mcp[speedups]``
+    except ImportError:
+        return False
+    import asyncio
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+@lru_cache(maxsize=1)
+def http2_available() -> bool:
+    """Return whether httpx can negotiate HTTP/2 (needs the optional *h2* package).
+
+    Install with ``pip install ape-mcp[speedups]``; without it the pooled
+    clients fall back to plain HTTP/1.1 keep-alive.
+    """
+    try:
+        import h2  # noqa: F401
+    except ImportError:  # pragma: no cover
+        return False
+    return True
+
+
 def decode_base64_image(image_base64: str) -> "Image.Image":
     try:
         from PIL import Image  # local import – heavy
@@ -49,9 +134,14 @@ def _get_tokenizer(model_name: str = "Qwen/Qwen3-8B"):
     return AutoTokenizer.from_pretrained(model_name, use_fast=True)
 
 
+@lru_cache(maxsize=2048)
 def count_tokens(text: str, model_name: str = "Qwen/Qwen3-8B") -> int:
     """Return the number of tokens *text* occupies for *model_name*.
 
+    Results are memoised by ``(text, model_name)``: the system prompt, tool
+    schemas and earlier turns are counted again and again across iterations,
+    and tokenisation is deterministic.
+
     Examples
     --------
     >>> from ape.utils import count_tokens
@@ -64,6 +154,17 @@ def count_tokens(text: str, model_name: str = "Qwen/Qwen3-8B") -> int:
     # NOTE: we do *not* add special tokens so the count reflects raw payload
     return len(tokenizer.encode(text, add_special_tokens=False))
 
+# Successful ``get_ollama_model_info`` lookups keyed by model name – model
+# metadata is static for the lifetime of the process, so every agent/session
+# after the first skips the ``/api/show`` round-trip.
+_MODEL_INFO_CACHE: dict[str, dict] = {}
+
+
+def clear_model_info_cache() -> None:
+    """Forget cached model metadata (e.g. after pulling a new model tag)."""
+    _MODEL_INFO_CACHE.clear()
+
+
 async def get_ollama_model_info(model_name: str | None = None) -> dict:
     """Return structured information about an Ollama model.
 
@@ -94,6 +195,9 @@ async def get_ollama_model_info(model_name: str | None = None) -> dict:
             }
 
         Fields missing in the Ollama response are omitted.
+
+    Results are cached per *model_name* (see :func:`clear_model_info_cache`);
+    callers receive a shallow copy.
     """
 
     from ape.settings import settings
@@ -101,6 +205,10 @@ async def get_ollama_model_info(model_name: str | None = None) -> dict:
     if model_name is None:
         model_name = settings.LLM_MODEL
 
+    cached = _MODEL_INFO_CACHE.get(model_name)
+    if cached is not None:
+        return dict(cached)
+
     # Import lazily to avoid heavy deps where not needed
     try:
         import ollama
@@ -178,4 +286,5 @@ async def get_ollama_model_info(model_name: str | None = None) -> dict:
     #         lic = "\n".join(lic)
     #     info["license"] = lic
 
-    return info 
\ No newline at end of file
+    _MODEL_INFO_CACHE[model_name] = info
+    return dict(info) 
\ No newline at end of file
@@ -22,12 +22,9 @@ import os
 import pprint
 from typing import Optional, Dict, Any, List
 from datetime import datetime
-import importlib
 
-import torch
 from loguru import logger
-import ollama
-from ape.utils import setup_logger, count_tokens
+from ape.utils import setup_logger, json_dumps, json_loads, use_uvloop
 
 from ape.mcp.session_manager import get_session_manager
 from ape.cli.context_manager import ContextManager
@@ -97,6 +94,7 @@ class APEChatCLI:
         if success:
             # expose underlying session for legacy code paths (to be removed later)
             self.mcp_session = self.mcp_client.mcp_session
+            self.chat_agent.invalidate_capabilities()
         return success
     
     async def disconnect_from_mcp(self):
@@ -150,14 +148,14 @@ class APEChatCLI:
                 
                 try:
                     logger.debug(f"Raw history_text: {history_text}")
-                    envelope = json.loads(history_text)
+                    envelope = json_loads(history_text)
                     logger.debug(f"Decoded envelope: {envelope}")
                     payload_str = envelope.get('payload')
                     if not payload_str:
                         raise ValueError("Missing 'payload' in tool response")
                     logger.debug(f"Payload string: {payload_str}")
 
-                    tool_result = json.loads(payload_str)
+                    tool_result = json_loads(payload_str)
                     logger.debug(f"Decoded tool_result: {tool_result}")
                     history = tool_result.get('result')
                     logger.debug(f"Final history object: {history}")
@@ -224,8 +222,14 @@ class APEChatCLI:
         }
         
         try:
+            # One concurrent round-trip for all three listings
+            tools_result, prompts_result, resources_result = await self.mcp_client.list_all(
+                return_exceptions=True
+            )
+
             # Discover available tools
-            tools_result = await self.mcp_session.list_tools()
+            if isinstance(tools_result, BaseException):
+                raise tools_result
             capabilities["tools"] = [
                 {
                     "name": tool.name,
@@ -237,7 +241,8 @@ class APEChatCLI:
             
             # Discover available prompts (new SDKs) – with graceful fallback
             try:
-                prompts_result = await self.mcp_session.list_prompts()
+                if isinstance(prompts_result, BaseException):
+                    raise prompts_result
                 prompt_items = getattr(prompts_result, "prompts", prompts_result)
                 capabilities["prompts"] = [
                     {
@@ -263,7 +268,8 @@ class APEChatCLI:
                     logger.debug(f"Local prompt registry fallback failed: {loc_exc}")
             
             # Discover available resources
-            resources_result = await self.mcp_session.list_resources()
+            if isinstance(resources_result, BaseException):
+                raise resources_result
             capabilities["resources"] = [
                 {
                     "name": resource.name,
@@ -274,7 +280,11 @@ class APEChatCLI:
                 for resource in resources_result.resources
             ]
             
-            logger.info(f"🔍 [MCP CLIENT] Discovered capabilities: {json.dumps(capabilities, indent=2)}")
+            # Lazy: the (multi-KB) dump is only built if INFO is actually emitted
+            logger.opt(lazy=True).info(
+                "🔍 [MCP CLIENT] Discovered capabilities: {}",
+                lambda: json_dumps(capabilities, indent=True),
+            )
             return capabilities
             
         except Exception as e:
@@ -325,7 +335,8 @@ class APEChatCLI:
             "system",
             {
                 "agent_name": "APE",
-                "current_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                # Minute precision keeps the prompt prefix stable across turns
+                "current_date": datetime.now().strftime("%Y-%m-%d %H:%M"),
                 "tools_section": tools_section,
                 "prompts_section": prompts_section,
                 "resources_section": resources_section,
@@ -360,8 +371,8 @@ class APEChatCLI:
                 {"role": "user", "content": message}
             ]
             
-            ollama = importlib.import_module("ollama")
-            client = ollama.AsyncClient(host=str(settings.OLLAMA_BASE_URL))
+            # Share the agent's pooled client instead of building one per message
+            client = self.chat_agent._get_ollama_client()
             
             while current_iteration < max_iterations:
                 current_chunk = ""
@@ -462,26 +473,12 @@ class APEChatCLI:
             return f"I encountered an error while processing your request: {str(e)}"
     
     async def get_ollama_tools(self) -> list:
-        """Get tools in Ollama format."""
+        """Get tools in Ollama format (from the agent's cached discovery)."""
         if not self.mcp_session:
             return []
         
         try:
-            tools_result = await self.mcp_session.list_tools()
-            ollama_tools = []
-            
-            for tool in tools_result.tools:
-                ollama_tool = {
-                    "type": "function",
-                    "function": {
-                        "name": tool.name,
-                        "description": tool.description,
-                        "parameters": tool.inputSchema
-                    }
-                }
-                ollama_tools.append(ollama_tool)
-            
-            return ollama_tools
+            return await self.chat_agent.get_ollama_tools()
             
         except Exception as e:
             logger.error(f"Error getting Ollama tools: {e}")
@@ -542,12 +539,11 @@ class APEChatCLI:
                     })
             
             # Format results with validation and error detection
-            formatted_response = "🔧 Tool Execution Results:\n\n"
+            parts: list[str] = []
             has_valid_data = False
             
             for idx, result in enumerate(results, 1):
-                formatted_response += f"**Tool {idx}: {result['tool']}**\n"
-                formatted_response += f"Arguments: {result['arguments']}\n"
+                parts.append(f"**Tool {idx}: {result['tool']}**\nArguments: {result['arguments']}\n")
                 
                 # Validate tool result and detect issues
                 tool_result = result['result']
@@ -556,38 +552,38 @@ class APEChatCLI:
                 ])
                 
                 if is_error:
-                    formatted_response += f"⚠️ **ISSUE DETECTED**: {tool_result}\n"
-                    formatted_response += "❗ This tool did not return valid data. Do not use invented data.\n\n"
+                    parts.append(f"⚠️ **ISSUE DETECTED**: {tool_result}\n")
+                    parts.append("❗ This tool did not return valid data. Do not use invented data.\n\n")
                 else:
                     try:
                         # Attempt to decode the JWT-like envelope
-                        envelope = json.loads(tool_result)
+                        envelope = json_loads(tool_result)
                         payload_str = envelope.get('payload')
                         if not payload_str:
                             raise ValueError("Missing 'payload' in tool response")
                         
                         # The payload itself is a JSON string, decode it
-                        final_data = json.loads(payload_str)
+                        final_data = json_loads(payload_str)
                         
                         # Now pretty-print the actual result object
                         pretty_result = pprint.pformat(final_data, indent=2)
-                        formatted_response += f"Result:\n{pretty_result}\n\n"
+                        parts.append(f"Result:\n{pretty_result}\n\n")
 
                     except (json.JSONDecodeError, TypeError, ValueError):
                         # If anything fails, just print the raw result
-                        formatted_response += f"Result: {tool_result}\n\n"
+                        parts.append(f"Result: {tool_result}\n\n")
                     
                     has_valid_data = True
             
             # Add explicit warning if no valid data was obtained
             if not has_valid_data:
-                formatted_response += """
+                parts.append("""
 🚨 **CRITICAL WARNING**: None of the tools returned valid data.
 - DO NOT invent or assume any numbers, facts, or information
 - Inform the user about the tool execution issues
 - Ask for help debugging the problem or suggest alternative approaches
 - NEVER present made-up data as if it came from the tools
-"""
+""")
             
             # Add key extracted values that might be useful for next steps
             key_values = {}
@@ -596,13 +592,13 @@ class APEChatCLI:
                     key_values[key] = value
             
             if key_values:
-                formatted_response += "📊 Key Values Available:\n"
-                for key, value in key_values.items():
-                    formatted_response += f"- {key}: {value}\n"
-                formatted_response += "\n"
+                parts.append("📊 Key Values Available:\n")
+                parts.extend(f"- {key}: {value}\n" for key, value in key_values.items())
+                parts.append("\n")
             
             logger.info(f"✅ [MCP CLIENT] Successfully executed {len(results)} tools")
-            return formatted_response
+            # Single join instead of repeated += (quadratic in result size)
+            return "🔧 Tool Execution Results:\n\n" + "".join(parts)
                 
         except Exception as e:
             logger.error(f"❌ [MCP CLIENT] Error handling tool calls: {e}")
@@ -694,9 +690,9 @@ The agent will use its natural reasoning to break down complex tasks!
                 return
 
             raw_msg_count = len(mem.messages)
-            raw_tokens = sum(count_tokens(m["content"]) for m in mem.messages)
-            summary_tokens = count_tokens(mem.summary)
-            total = mem.tokens()
+            raw_tokens = mem.raw_tokens()
+            summary_tokens = mem.summary_tokens()
+            total = raw_tokens + summary_tokens
 
             print("\n🧠 WINDOW MEMORY STATUS")
             print("-" * 60)
@@ -810,6 +806,7 @@ The agent will use its natural reasoning to break down complex tasks!
         
         finally:
             await self.disconnect_from_mcp()
+            await self.chat_agent.aclose()
             # ------------------------------------------------------------------
             # Ensure all background resources (e.g. aiosqlite worker threads)
             # are cleaned up so the interpreter can exit without requiring
@@ -833,7 +830,8 @@ async def main():
     
     # Check if Ollama is available
     try:
-        ollama = importlib.import_module("ollama")
+        import ollama  # lazy: only needed for this start-up probe
+
         client = ollama.Client(host=str(settings.OLLAMA_BASE_URL))
         models = client.list()
         if not models.get('models'):
@@ -849,6 +847,7 @@ async def main():
 
 
 if __name__ == "__main__":
+    use_uvloop()
     try:
         asyncio.run(main())
     except KeyboardInterrupt: